@@ -1,16 +1,147 @@
-import time, re, os, pickle, requests, yaml
+import time, re, os, csv, json, pickle, requests, yaml
+from datetime import datetime
 from urllib.parse import unquote, quote
-from collections import Counter
-from playwright.sync_api import sync_playwright
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+
+
+class ScanMetrics:
+    # Upper bounds (seconds) for latency histogram buckets, Prometheus style
+    buckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.started = time.time()
+        self.counters = Counter()
+        self.latencies = defaultdict(list)
+        self.phases = defaultdict(float)
+
+    def count(self, source, outcome):
+        self.counters[(source, outcome)] += 1
+
+    def observe(self, source, seconds):
+        self.latencies[source].append(seconds)
+
+    @contextmanager
+    def timed(self, source):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(source, time.perf_counter() - start)
+
+    def lap(self, phase, since):
+        now = time.perf_counter()
+        self.phases[phase] += now - since
+        return now
+
+    @staticmethod
+    def _percentile(values, pct):
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[idx]
+
+    def summary(self):
+        sources = sorted({s for s, _ in self.counters} | set(self.latencies))
+        rows = []
+        for source in sources:
+            hits = self.counters[(source, "hit")]
+            misses = self.counters[(source, "miss")]
+            lat = self.latencies.get(source, [])
+            rows.append({
+                "source": source,
+                "cache_hits": hits,
+                "cache_misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+                "errors": self.counters[(source, "error")],
+                "requests": len(lat),
+                "latency_total_s": round(sum(lat), 4),
+                "latency_p50_s": round(self._percentile(lat, 50), 4),
+                "latency_p95_s": round(self._percentile(lat, 95), 4),
+                "latency_max_s": round(max(lat), 4) if lat else 0.0,
+            })
+        return rows
+
+    def histogram(self, source):
+        lat = self.latencies.get(source, [])
+        return [(b, sum(1 for v in lat if v <= b)) for b in self.buckets]
+
+    def write_report(self, out_dir, prometheus_path=None):
+        os.makedirs(out_dir, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.started).strftime("%Y-%m-%d_%H-%M-%S")
+        rows = self.summary()
+
+        json_path = os.path.join(out_dir, f"scan_metrics_{stamp}.json")
+        with open(json_path, 'w') as f:
+            json.dump({
+                "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "duration_s": round(time.time() - self.started, 2),
+                "sources": rows,
+                "histograms": {r["source"]: self.histogram(r["source"]) for r in rows},
+                "phases_s": {k: round(v, 3) for k, v in sorted(self.phases.items())},
+            }, f, indent=2)
+
+        csv_path = os.path.join(out_dir, f"scan_metrics_{stamp}.csv")
+        with open(csv_path, 'w', newline='') as f:
+            fields = list(rows[0].keys()) if rows else ["source"]
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+        return json_path, csv_path
+
+    def write_prometheus(self, path):
+        lines = [
+            "# TYPE mtg_scanner_cache_total counter",
+            "# TYPE mtg_scanner_request_seconds histogram",
+            "# TYPE mtg_scanner_phase_seconds gauge",
+        ]
+        for (source, outcome), n in sorted(self.counters.items()):
+            lines.append(f'mtg_scanner_cache_total{{source="{source}",outcome="{outcome}"}} {n}')
+        for source, lat in sorted(self.latencies.items()):
+            for bound, n in self.histogram(source):
+                lines.append(f'mtg_scanner_request_seconds_bucket{{source="{source}",le="{bound}"}} {n}')
+            lines.append(f'mtg_scanner_request_seconds_bucket{{source="{source}",le="+Inf"}} {len(lat)}')
+            lines.append(f'mtg_scanner_request_seconds_sum{{source="{source}"}} {sum(lat):.6f}')
+            lines.append(f'mtg_scanner_request_seconds_count{{source="{source}"}} {len(lat)}')
+        for name, seconds in sorted(self.phases.items()):
+            lines.append(f'mtg_scanner_phase_seconds{{phase="{name}"}} {seconds:.6f}')
+
+        # Write-then-rename so node_exporter never reads a half-written file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
 
 
 class MTGDeckScanner:
-    def __init__(self, cache_dir=None, config_filename="mtg_scanner_config.yaml", min_percentage=0.20):
+    # Image alt texts that belong to site chrome (logo, avatars, nav), not to decklist cards
+    chrome_alt_words = [
+        "topdeck", "logo", "avatar", "profile", "banner", "discord",
+        "twitter", "match history", "standings", "deck", "event",
+        "buy", "card image"
+    ]
+
+    def __init__(self, cache_dir=None, config_filename="mtg_scanner_config.yaml", min_percentage=0.20,
+                 metrics_textfile=None):
         # Configuration
         base_cache = os.getenv("CACHE_ROOT", os.path.abspath(os.path.dirname(__file__)))
         self.cache_dir = cache_dir or os.path.join(base_cache, "mtg_scanner_cache")
         self.min_percentage = min_percentage
 
+        # Browser waits: hard cap per page and how long the DOM must stay quiet to count as loaded
+        self.page_wait_cap_ms = 10000
+        self.settle_ms = 750
+        self.blocked_resource_types = {"image", "media", "font"}
+        self.blocked_hosts = (
+            "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+            "facebook.net", "hotjar.com", "segment.io", "clarity.ms", "sentry.io"
+        )
+
         os.makedirs(self.cache_dir, exist_ok=True)
 
         self.config_file = os.path.join(self.cache_dir, config_filename)
@@ -18,6 +149,9 @@ class MTGDeckScanner:
         self.scryfall_cache_file = os.path.join(self.cache_dir, "scryfall_data.pkl")
         self.deck_cache_file = os.path.join(self.cache_dir, "topdeck_deck_data.pkl")
         self.excluded_file = os.path.join(self.cache_dir, "excluded_cards.txt")
+        self.metrics_dir = os.path.join(self.cache_dir, "scan_reports")
+        self.metrics_textfile = metrics_textfile or os.getenv("MTG_SCANNER_PROM_TEXTFILE")
+        self.metrics = ScanMetrics()
 
         self.type_order = [
             "Commander", "Creature", "Artifact", "Enchantment",
@@ -80,8 +214,11 @@ class MTGDeckScanner:
 
         if os.path.exists(gc_cache_file):
             if time.time() - os.path.getmtime(gc_cache_file) < 7 * 86400:
+                self.metrics.count("game_changers", "hit")
                 return self._load_cache(gc_cache_file)
 
+        self.metrics.count("game_changers", "miss")
+
         print("Fetching latest Game Changers list from Scryfall API...")
         gc_list = set()
         url = "https://api.scryfall.com/cards/search?q=is:gamechanger"
@@ -89,7 +226,8 @@ class MTGDeckScanner:
         try:
             while url:
                 time.sleep(0.1)
-                response = requests.get(url, headers={"User-Agent": "EDH-Builder-Script/1.0"})
+                with self.metrics.timed("scryfall"):
+                    response = requests.get(url, headers={"User-Agent": "EDH-Builder-Script/1.0"})
                 if response.status_code == 200:
                     data = response.json()
                     for card in data.get("data", []):
@@ -105,7 +243,7 @@ class MTGDeckScanner:
                 self._save_cache(gc_list, gc_cache_file)
                 return gc_list
         except Exception:
-            pass
+            self.metrics.count("game_changers", "error")
 
         if os.path.exists(gc_cache_file):
             return self._load_cache(gc_cache_file)
@@ -121,22 +259,56 @@ class MTGDeckScanner:
         with open(filepath, 'wb') as f:
             pickle.dump(cache_dict, f)
 
+    def _block_unneeded_requests(self, route):
+        request = route.request
+        if (request.resource_type in self.blocked_resource_types
+                or any(host in request.url for host in self.blocked_hosts)):
+            route.abort()
+        else:
+            route.continue_()
+
+    def _wait_for_growth(self, page, count_expr, last_count, timeout_ms):
+        try:
+            page.wait_for_function(
+                f"n => ({count_expr}) > n", arg=last_count, timeout=timeout_ms
+            )
+            return True
+        except PlaywrightTimeoutError:
+            return False
+
+    def _wait_for_settled(self, page, count_expr):
+        # Wait for the first results, then until count_expr stops growing for settle_ms (capped)
+        deadline = time.monotonic() + self.page_wait_cap_ms / 1000
+        if not self._wait_for_growth(page, count_expr, 0, self.page_wait_cap_ms):
+            return
+        while time.monotonic() < deadline:
+            count = page.evaluate(count_expr)
+            if not self._wait_for_growth(page, count_expr, count, self.settle_ms):
+                break
+
     def auto_scroll_to_bottom(self, page):
-        last_height = page.evaluate("document.body.scrollHeight")
-        while True:
+        height_expr = "document.body.scrollHeight"
+        last_height = page.evaluate(height_expr)
+        deadline = time.monotonic() + self.page_wait_cap_ms / 1000
+        while time.monotonic() < deadline:
             page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            page.wait_for_timeout(2000)
-            new_height = page.evaluate("document.body.scrollHeight")
-            if new_height == last_height:
+            # Next result batch shows up as page growth; stop once nothing new arrives within settle_ms
+            if not self._wait_for_growth(page, height_expr, last_height, self.settle_ms):
                 break
-            last_height = new_height
+            last_height = page.evaluate(height_expr)
 
     def get_topdeck_urls(self, page, commander_url, force_refresh=False):
         if commander_url in self.topdeck_cache and not force_refresh:
+            self.metrics.count("topdeck_urls", "hit")
             return self.topdeck_cache[commander_url]
 
-        page.goto(commander_url, wait_until="networkidle")
-        self.auto_scroll_to_bottom(page)
+        self.metrics.count("topdeck_urls", "miss")
+        with self.metrics.timed("browser_page"):
+            page.goto(commander_url, wait_until="domcontentloaded")
+            self._wait_for_settled(
+                page, "(document.body.innerHTML.match(/topdeck\\.gg\\/deck\\//g) || []).length"
+            )
+            self.auto_scroll_to_bottom(page)
 
         html_content = page.content()
         td_regex = re.compile(r"topdeck\.gg/deck/[a-zA-Z0-9_-]+/[a-zA-Z0-9_-]+")
@@ -149,11 +321,20 @@ class MTGDeckScanner:
 
     def scrape_deck_data(self, page, url):
         if url in self.deck_cache:
+            self.metrics.count("topdeck_deck", "hit")
             return self.deck_cache[url]
 
+        self.metrics.count("topdeck_deck", "miss")
         try:
-            page.goto(url, wait_until="networkidle")
-            page.wait_for_timeout(1500)
+            with self.metrics.timed("browser_page"):
+                page.goto(url, wait_until="domcontentloaded")
+                # Count card images only: the chrome images are already there at domcontentloaded
+                self._wait_for_settled(page, (
+                    "Array.from(document.querySelectorAll('img[alt]')).filter(img => {"
+                    " const alt = (img.getAttribute('alt') || '').replace(/^\\s*\\d+x?\\s+/i, '').trim().toLowerCase();"
+                    f" return alt.length >= 2 && !/^\\d/.test(alt) && !{json.dumps(self.chrome_alt_words)}.some(b => alt.includes(b));"
+                    " }).length"
+                ))
 
             data = page.evaluate('''() => {
                 let found = new Set();
@@ -192,29 +373,27 @@ class MTGDeckScanner:
                 return { cards: Array.from(found), basicCounts };
             }''')
 
-            bad = [
-                "topdeck", "logo", "avatar", "profile", "banner", "discord",
-                "twitter", "match history", "standings", "deck", "event",
-                "buy", "card image"
-            ]
-
             clean_cards = [
                 n for n in data['cards']
-                if not any(b in n.lower() for b in bad)
+                if not any(b in n.lower() for b in self.chrome_alt_words)
                    and not re.match(r'^\d', n)
             ]
 
             result = (clean_cards, data['basicCounts'])
-            self.deck_cache[url] = result
-            self._save_cache(self.deck_cache, self.deck_cache_file)
+            # An empty list usually means the decklist never loaded; don't pin that in the cache
+            if clean_cards:
+                self.deck_cache[url] = result
+                self._save_cache(self.deck_cache, self.deck_cache_file)
             return result
 
         except Exception as e:
+            self.metrics.count("topdeck_deck", "error")
             print(f"Error reading {url}: {e}")
             return [], {"mountain": 0, "forest": 0, "plains": 0, "island": 0, "swamp": 0, "wastes": 0}
 
     def get_scryfall_data(self, card_name):
         if card_name in self.scryfall_cache:
+            self.metrics.count("scryfall", "hit")
             cached_data = self.scryfall_cache[card_name]
             if len(cached_data) == 3:
                 real_name, type_line, is_legal = cached_data
@@ -224,12 +403,14 @@ class MTGDeckScanner:
                 self._save_cache(self.scryfall_cache, self.scryfall_cache_file)
             return cached_data
 
+        self.metrics.count("scryfall", "miss")
         time.sleep(0.1)
         url = f"https://api.scryfall.com/cards/named?exact={quote(card_name)}"
         try:
-            response = requests.get(
-                url, headers={"User-Agent": "EDH-Builder-Script/1.0"}
-            )
+            with self.metrics.timed("scryfall"):
+                response = requests.get(
+                    url, headers={"User-Agent": "EDH-Builder-Script/1.0"}
+                )
             if response.status_code == 200:
                 res_data = response.json()
                 type_line = res_data.get("type_line", "")
@@ -250,7 +431,7 @@ class MTGDeckScanner:
                 self._save_cache(self.scryfall_cache, self.scryfall_cache_file)
                 return result
         except Exception:
-            pass
+            self.metrics.count("scryfall", "error")
 
         is_gc = card_name.lower() in self.game_changers
         result = (card_name, "", True, is_gc)
@@ -275,7 +456,9 @@ class MTGDeckScanner:
         bracket_text = f" (Bracket {bracket})" if bracket else ""
         print(f"\n{'=' * 60}\nGathering Consensus Data for: {commander_name}{bracket_text}\n{'=' * 60}")
 
+        phase_start = time.perf_counter()
         urls = self.get_topdeck_urls(page, commander_url)
+        phase_start = self.metrics.lap(f"{commander_name}/topdeck_urls", phase_start)
         if not urls:
             print("No lists found!")
             return
@@ -314,6 +497,7 @@ class MTGDeckScanner:
             for k in total_basics:
                 total_basics[k] += b_counts.get(k, 0)
 
+        phase_start = self.metrics.lap(f"{commander_name}/decklists", phase_start)
         if valid_deck_count == 0:
             print(f"\nNo valid decklists could be processed for {commander_name}.")
             return
@@ -355,6 +539,7 @@ class MTGDeckScanner:
                 total_instants_all_decks += raw_card_counter[card]
 
         print(" " * 80, end="\r")
+        phase_start = self.metrics.lap(f"{commander_name}/scryfall_types", phase_start)
 
         dynamic_min_lands = round(total_lands_all_decks / valid_deck_count)
         dynamic_min_instants = round(total_instants_all_decks / valid_deck_count)
@@ -685,6 +870,7 @@ class MTGDeckScanner:
             final_land_counts[land_name] += count
 
         deck_list["Land"] = [f"{count} {name}" for name, count in final_land_counts.items()]
+        self.metrics.lap(f"{commander_name}/build", phase_start)
 
         print(f"\n\n### {commander_name} - Meta Optimized Decklist")
         for category in self.type_order:
@@ -703,12 +889,26 @@ class MTGDeckScanner:
         with sync_playwright() as p:
             browser = p.chromium.launch(headless=True)
             page = browser.new_page()
+            page.route("**/*", self._block_unneeded_requests)
 
             for target in self.commander_targets:
                 self.analyze_commander(page, target["url"], target.get("bracket"))
 
             browser.close()
 
+        self.report_metrics()
+
+    def report_metrics(self):
+        print(f"\n{'=' * 60}\nScan Telemetry\n{'=' * 60}")
+        for row in self.metrics.summary():
+            hit_rate = f"{row['hit_rate']:.0%}" if row['hit_rate'] is not None else "n/a"
+            print(
+                f"{row['source']:<16} hits {row['cache_hits']:>5} | misses {row['cache_misses']:>5} "
+                f"({hit_rate} cached) | requests {row['requests']:>5} | "
+                f"p50 {row['latency_p50_s']:.2f}s | p95 {row['latency_p95_s']:.2f}s"
+            )
+        json_path, csv_path = self.metrics.write_report(self.metrics_dir, self.metrics_textfile)
+        print(f"Run report saved to {json_path} and {csv_path}")
 
 if __name__ == "__main__":
     scanner = MTGDeckScanner()
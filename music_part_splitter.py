@@ -1,25 +1,379 @@
+import os
 import re
+import json
+import time
+import bisect
+import hashlib
 import difflib
 import logging
 import argparse
 import yaml
 import sys
 from pathlib import Path
+from functools import partial
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 try:
     from pypdf import PdfWriter, PdfReader
 except ImportError:
     import warnings
     warnings.filterwarnings("ignore", category=DeprecationWarning, module="PyPDF2")
     from PyPDF2 import PdfWriter, PdfReader
-from pdf2image import convert_from_path
+import numpy as np
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
 import pytesseract
 
 
+TESSERACT_CONFIG = '--psm 3'
+
+
+def _otsu_threshold(gray):
+    """Otsu's global threshold, or None when the image is a single gray level (blank page)."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    if np.count_nonzero(hist) < 2:
+        return None
+    omega = np.cumsum(hist) / hist.sum()
+    mu = np.cumsum(hist * np.arange(256)) / hist.sum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    return int(np.nanargmax(between))
+
+
+def _horizontal_opening(mask, k):
+    """Morphological opening with a 1xk kernel: keeps only horizontal ink runs at least k pixels long."""
+    h, w = mask.shape
+    if k > w:
+        return np.zeros_like(mask)
+    cs = np.pad(np.cumsum(mask, axis=1, dtype=np.int32), ((0, 0), (1, 0)))
+    full = (cs[:, k:] - cs[:, :-k]) == k
+    cf = np.pad(np.cumsum(full, axis=1, dtype=np.int32), ((0, 0), (1, 0)))
+    x = np.arange(w)
+    return (cf[:, np.minimum(x, w - k) + 1] - cf[:, np.maximum(x - k + 1, 0)]) > 0
+
+
+def _preprocess_page(img, pad=12, crop_header=True):
+    """
+    Binarizes an engraved page (Otsu) and erases staff lines and other long horizontal strokes.
+    With crop_header it also crops to the text above the first staff system (falling back to the
+    ink bounding box when the page has no header band), so tesseract sees a small, clean image
+    instead of notation. A blank page comes back as a small white image.
+    """
+    gray = np.asarray(img.convert('L'))
+    threshold = _otsu_threshold(gray)
+    if threshold is None:
+        return Image.new('L', (2 * pad + 1, 2 * pad + 1), 255)
+    ink = gray <= threshold
+    h, w = ink.shape
+
+    lines = _horizontal_opening(ink, max(1, w // 8))
+    ink &= ~lines
+    if not crop_header:
+        return Image.fromarray(np.where(ink, 0, 255).astype(np.uint8), mode='L')
+
+    top, bottom = 0, h
+    staff_rows = np.flatnonzero(lines.sum(axis=1) >= w // 2)
+    if staff_rows.size and staff_rows[0] > h * 0.04:
+        bottom = int(staff_rows[0] - h * 0.005)
+
+    rows = np.flatnonzero(ink[top:bottom].any(axis=1))
+    cols = np.flatnonzero(ink[top:bottom].any(axis=0))
+    if rows.size and cols.size:
+        top, bottom = top + rows[0], top + rows[-1] + 1
+        left, right = cols[0], cols[-1] + 1
+    else:
+        left, right = 0, w
+
+    region = ink[max(0, top - pad):min(h, bottom + pad), max(0, left - pad):min(w, right + pad)]
+    return Image.fromarray(np.where(region, 0, 255).astype(np.uint8), mode='L')
+
+
+def _ocr_image(img, preprocess=False, crop_header=False):
+    if preprocess:
+        img = _preprocess_page(img, crop_header=crop_header)
+    # Only downcase the string now; no regex normalization
+    return pytesseract.image_to_string(img.convert('L'), config=TESSERACT_CONFIG).lower()
+
+
+def _rasterize_page(file_path, page_number, dpi):
+    return convert_from_path(file_path, dpi=dpi, first_page=page_number, last_page=page_number)[0]
+
+
+def _header_is_conclusive(text, matcher, conductor_regex):
+    """A header-band OCR pass settles the page when it has any exact alias or conductor hit."""
+    return bool(conductor_regex.search(text)) or any(matcher.exact_scores(text))
+
+
+def _ocr_pdf_page(file_path, page_number, dpi, header_dpi=None, header_fraction=0.3, header_matcher=None,
+                  conductor_regex=None, header_text=None, preprocess=False):
+    """
+    Rasterizes and OCRs one page (1-based). Module-level so it can run in worker processes.
+    With header_matcher (an AliasMatcher) set, only the top band is OCR'd at header_dpi first;
+    the full page is OCR'd only if that band has no alias or conductor hit. A previously cached header_text
+    skips the header pass. Returns (text, region, ocr_texts, timings) where ocr_texts maps each
+    region actually OCR'd in this call to its text and timings holds rasterize/ocr seconds.
+    """
+    ocr_texts = {}
+    timings = {'rasterize': 0.0, 'ocr': 0.0}
+
+    def ocr_region(page_dpi, fraction=None):
+        start = time.perf_counter()
+        img = _rasterize_page(file_path, page_number, page_dpi)
+        timings['rasterize'] += time.perf_counter() - start
+        try:
+            if fraction is not None:
+                img = img.crop((0, 0, img.width, int(img.height * fraction)))
+            start = time.perf_counter()
+            # Only the header pass is cropped to the band above the first staff; the full-page
+            # fallback must still see part labels further down continuation pages
+            text = _ocr_image(img, preprocess, crop_header=fraction is not None)
+            timings['ocr'] += time.perf_counter() - start
+            return text
+        finally:
+            img.close()
+
+    if header_matcher is not None:
+        if header_text is None:
+            header_text = ocr_texts['header'] = ocr_region(header_dpi, header_fraction)
+        if _header_is_conclusive(header_text, header_matcher, conductor_regex):
+            return header_text, 'header', ocr_texts, timings
+
+    text = ocr_texts['full'] = ocr_region(dpi)
+    return text, 'full', ocr_texts, timings
+
+
+def _write_part_files(source, jobs, compress=False):
+    """
+    Writes several part PDFs from a single read of source. jobs is [(out_file, page_indexes)].
+    Identical objects (fonts, images and forms repeated across pages) are merged in each output,
+    and compress deflates page content streams. Module-level so it can run in worker processes.
+    Returns [(out_file, page_count, size_bytes)].
+    """
+    reader = PdfReader(source)
+    written = []
+    for out_file, pages in jobs:
+        writer = PdfWriter()
+        for p in pages:
+            writer.add_page(reader.pages[p])
+
+        if compress:
+            for page in writer.pages:
+                page.compress_content_streams()
+        # Only available in pypdf; PyPDF2 writes what it was given
+        if hasattr(writer, 'compress_identical_objects'):
+            writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+
+        with open(out_file, "wb") as f:
+            writer.write(f)
+        written.append((out_file, len(pages), Path(out_file).stat().st_size))
+    return written
+
+
+class AliasMatcher:
+    """
+    Scores OCR text against every instrument alias in one pass.
+
+    Exact hits come from an Aho-Corasick automaton over all aliases, with the same word-boundary
+    and non-overlapping semantics as re.findall(r"\b<alias>\b"). The fuzzy fallback buckets aliases
+    by word count and length and only runs difflib on candidates whose length and character bag
+    can still reach the threshold, so it returns exactly what the brute-force n-gram scan would.
+    New aliases are added in place; the automaton's failure links are rebuilt lazily on next use.
+    """
+    _word_char = re.compile(r'\w')
+
+    def __init__(self, instruments, fuzzy_threshold=0.88):
+        self.names = [name for name, _ in instruments]
+        self.fuzzy_threshold = fuzzy_threshold
+        self._index = {name: i for i, name in enumerate(self.names)}
+        self._entries = []
+        self._goto = [{}]
+        self._out = [[]]
+        self._fail = [0]
+        self._out_all = [[]]
+        self._dirty = False
+        # word count -> (sorted alias lengths, [(len, inst_idx, char bag, SequenceMatcher)])
+        self._fuzzy = {}
+
+        for name, aliases in instruments:
+            for a in aliases:
+                self.add(name, a)
+
+    def add(self, name, alias):
+        if not alias:
+            return
+        if name not in self._index:
+            self._index[name] = len(self.names)
+            self.names.append(name)
+        inst_idx = self._index[name]
+
+        entry_id = len(self._entries)
+        self._entries.append((len(alias), inst_idx))
+        node = 0
+        for ch in alias:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._out.append([])
+                self._fail.append(0)
+            node = nxt
+        self._out[node].append(entry_id)
+        self._dirty = True
+
+        n_words = len(re.findall(r"[a-z0-9]+", alias))
+        if n_words:
+            lengths, entries = self._fuzzy.setdefault(n_words, ([], []))
+            pos = bisect.bisect_right(lengths, len(alias))
+            lengths.insert(pos, len(alias))
+            entries.insert(pos, (len(alias), inst_idx, Counter(alias), difflib.SequenceMatcher(None, '', alias)))
+
+    def compiled(self):
+        """Builds pending failure links now, e.g. before the matcher is pickled to worker processes."""
+        if self._dirty:
+            self._build_failure_links()
+        return self
+
+    def _build_failure_links(self):
+        self._fail = [0] * len(self._goto)
+        self._out_all = [list(out) for out in self._out]
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                self._out_all[child].extend(self._out_all[self._fail[child]])
+                queue.append(child)
+        self._dirty = False
+
+    def _is_word(self, text, i):
+        return 0 <= i < len(text) and self._word_char.match(text[i]) is not None
+
+    def exact_scores(self, text):
+        self.compiled()
+        scores = [0] * len(self.names)
+        last_end = {}
+        goto, fail, out_all = self._goto, self._fail, self._out_all
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for entry_id in out_all[node]:
+                length, inst_idx = self._entries[entry_id]
+                start, end = i - length + 1, i + 1
+                if start < last_end.get(entry_id, 0):
+                    continue
+                if (self._is_word(text, start - 1) != self._is_word(text, start)
+                        and self._is_word(text, end - 1) != self._is_word(text, end)):
+                    scores[inst_idx] += 1
+                    last_end[entry_id] = end
+        return scores
+
+    def fuzzy_scores(self, text):
+        t = self.fuzzy_threshold
+        words = re.findall(r"[a-z0-9]+", text)
+        scores = [0] * len(self.names)
+        for n, (lengths, entries) in self._fuzzy.items():
+            candidates = Counter(" ".join(words[i:i + n]) for i in range(0, max(1, len(words) - n + 1)))
+            for candidate, repeats in candidates.items():
+                c_len = len(candidate)
+                # ratio() can only reach t when the shorter string is at least t/(2-t) of the longer
+                lo = bisect.bisect_left(lengths, c_len * t / (2 - t) - 1)
+                hi = bisect.bisect_right(lengths, c_len * (2 - t) / t + 1)
+                bag = None
+                for a_len, inst_idx, a_bag, matcher in entries[lo:hi]:
+                    total = c_len + a_len
+                    if 2.0 * min(c_len, a_len) / total < t:
+                        continue
+                    if bag is None:
+                        bag = Counter(candidate)
+                    if 2.0 * sum((bag & a_bag).values()) / total < t:
+                        continue
+                    matcher.set_seq1(candidate)
+                    if matcher.ratio() >= t:
+                        scores[inst_idx] += repeats
+        return scores
+
+
+class OcrCache:
+    """
+    Per-PDF store of OCR text, addressed by the SHA-256 of the PDF bytes. Entries are keyed by
+    page, region, DPI and the tesseract version/config, so editing instruments.yaml never
+    invalidates them but changing how pages are OCR'd does.
+    """
+    def __init__(self, cache_dir, file_path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.cache_dir / f"{self._file_digest(file_path)}.json"
+        self.settings = f"tesseract-{self._tesseract_version()}|{TESSERACT_CONFIG}"
+        self.entries = {}
+        self.dirty = False
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    @staticmethod
+    def _file_digest(file_path):
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        return h.hexdigest()
+
+    @staticmethod
+    def _tesseract_version():
+        try:
+            return str(pytesseract.get_tesseract_version())
+        except Exception:
+            return 'unknown'
+
+    def _key(self, page_number, region, dpi):
+        return f"{self.settings}|{region}|{dpi}|{page_number}"
+
+    def get(self, page_number, region, dpi):
+        return self.entries.get(self._key(page_number, region, dpi))
+
+    def put(self, page_number, region, dpi, text):
+        self.entries[self._key(page_number, region, dpi)] = text
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
 class BigBandChartSplitter:
-    def __init__(self, config_path, log_level=logging.INFO):
+    def __init__(self, config_path, log_level=logging.INFO, workers=None, dpi=300,
+                 header_first=False, header_dpi=150, header_fraction=0.3, cache_dir=None, interactive=True,
+                 compress=False, preprocess=False):
         self.logger = logging.getLogger("BigBandSplitter")
         self.logger.setLevel(log_level)
         self.config_path = config_path
+        self.workers = workers or os.cpu_count() or 1
+        self.dpi = dpi
+        self.header_first = header_first
+        self.header_dpi = header_dpi
+        self.header_fraction = header_fraction
+        # OCR cache lives next to the config by default; pass cache_dir=False to disable it
+        self.cache_dir = Path(config_path).parent / 'ocr_cache' if cache_dir is None else cache_dir
+        # Non-interactive runs defer unrecognized pages to a review queue instead of prompting
+        self.interactive = interactive
+        self.compress = compress
+        self.preprocess = preprocess
+        self._pool = None
+        # Cumulative seconds per stage (rasterize/ocr are summed worker time)
+        self.stage_times = Counter()
 
         if not self.logger.handlers:
             h = logging.StreamHandler()
@@ -29,6 +383,7 @@ class BigBandChartSplitter:
         self.conductor_aliases = []
         self.conductor_regex = None
         self.instruments = []
+        self.alias_matcher = None
 
         self._load_config(config_path)
 
@@ -42,6 +397,7 @@ class BigBandChartSplitter:
             self._build_conductor_regex()
 
             self.instruments = [(inst['name'], inst['aliases']) for inst in config.get('instruments', [])]
+            self.alias_matcher = AliasMatcher(self.instruments)
         except Exception as e:
             self.logger.error(f"Failed to load configuration from {config_path}: {e}")
             sys.exit(1)
@@ -56,6 +412,10 @@ class BigBandChartSplitter:
                 patterns.append(re.escape(a))
         self.conductor_regex = re.compile('|'.join(patterns))
 
+    def _header_is_conclusive(self, text):
+        """Header check against the current aliases, including any learned in the wizard this run."""
+        return _header_is_conclusive(text, self.alias_matcher, self.conductor_regex)
+
     def _get_next_instrument(self, current_name):
         """Returns the next instrument in the sequence based on YAML order."""
         for i, (name, _) in enumerate(self.instruments):
@@ -85,6 +445,7 @@ class BigBandChartSplitter:
                     if name == instrument_name:
                         if new_alias not in aliases:
                             aliases.append(new_alias)
+                            self.alias_matcher.add(name, new_alias)
                         break
 
                 for inst in config_data.get('instruments', []):
@@ -108,27 +469,13 @@ class BigBandChartSplitter:
         best_inst = None
         highest_score = 0
 
-        for name, aliases in self.instruments:
-            score = 0
-            for a in aliases:
-                score += len(re.findall(r"\b" + re.escape(a) + r"\b", header_text))
+        for name, score in zip(self.alias_matcher.names, self.alias_matcher.exact_scores(header_text)):
             if score > highest_score:
                 highest_score = score
                 best_inst = name
 
         if highest_score == 0:
-            words = [w for w in re.findall(r"[a-z0-9]+", header_text)]
-            for name, aliases in self.instruments:
-                fscore = 0
-                for a in aliases:
-                    a_words = re.findall(r"[a-z0-9]+", a)
-                    n = len(a_words)
-                    if n == 0: continue
-                    for i in range(0, max(1, len(words) - n + 1)):
-                        candidate = " ".join(words[i:i + n])
-                        ratio = difflib.SequenceMatcher(None, candidate, a).ratio()
-                        if ratio >= 0.88:
-                            fscore += 1
+            for name, fscore in zip(self.alias_matcher.names, self.alias_matcher.fuzzy_scores(header_text)):
                 if fscore > highest_score:
                     highest_score = fscore
                     best_inst = name
@@ -184,17 +531,108 @@ class BigBandChartSplitter:
             except ValueError:
                 print("Please enter a valid number.")
 
-    def process_file(self, file_path, dump=False):
-        self.logger.info(f"Starting processing for: {file_path.name}")
-        self.logger.info(
-            f"Converting PDF to images at 300 DPI (This will take a moment for {file_path.stat().st_size / (1024 * 1024):.2f} MB)...")
-
-        images = convert_from_path(file_path, dpi=300)
-        self.logger.info(f"Successfully converted PDF into {len(images)} images. Starting OCR...")
-
-        out_dir = file_path.parent / f"{file_path.stem}_parts"
-        out_dir.mkdir(exist_ok=True)
+    def _cache_region(self, region):
+        """OCR cache region key; preprocessed text is cached separately from raw text."""
+        if region == 'header':
+            key = f"header@{self.header_fraction}"
+            return f"{key}+pre" if self.preprocess else key
+        # Full pages were once cropped like the header band; "+clean" keeps those entries unused
+        return f"{region}+clean" if self.preprocess else region
+
+    def _cached_page_text(self, cache, page_number):
+        """Returns (text, region) when the cache alone can resolve the page, else None."""
+        if cache is None:
+            return None
+        if self.header_first:
+            header_text = cache.get(page_number, self._cache_region('header'), self.header_dpi)
+            if header_text is not None and self._header_is_conclusive(header_text):
+                return header_text, 'header'
+        full_text = cache.get(page_number, self._cache_region('full'), self.dpi)
+        if full_text is not None:
+            return full_text, 'full'
+        return None
+
+    def _ocr_pages(self, file_path, page_count, cache=None):
+        """
+        Yields (text, region) for each page in page order. Each page is rasterized on its own and
+        released right after OCR, so peak memory depends on the worker count, not the page count.
+        Pages already in the OCR cache skip rasterization and OCR entirely.
+        """
+        ocr_page = partial(_ocr_pdf_page, file_path, dpi=self.dpi, preprocess=self.preprocess)
+        if self.header_first:
+            # Workers check the header band against a snapshot of the matcher; results are
+            # re-checked below against the live matcher, which may have learned aliases since
+            ocr_page = partial(ocr_page, header_dpi=self.header_dpi, header_fraction=self.header_fraction,
+                               header_matcher=self.alias_matcher.compiled(),
+                               conductor_regex=self.conductor_regex)
+
+        # Batch runs share one pool across files; single-file runs get their own
+        pool = own_pool = None
+        if self._pool is not None:
+            pool = self._pool
+        elif self.workers > 1 and page_count > 1:
+            pool = own_pool = ProcessPoolExecutor(max_workers=min(self.workers, page_count))
+
+        cache_hits = 0
+        jobs = []
+        try:
+            # Futures are consumed in submission order, so the caller's state machine (and the
+            # interactive wizard) can work on page N while later pages are still in flight.
+            # Only the path and page number cross the process boundary; images never leave the worker.
+            for n in range(1, page_count + 1):
+                cached = self._cached_page_text(cache, n)
+                if cached is not None:
+                    jobs.append(cached)
+                    continue
+                header_text = None
+                if cache is not None and self.header_first:
+                    header_text = cache.get(n, self._cache_region('header'), self.header_dpi)
+                job = partial(ocr_page, n, header_text=header_text)
+                jobs.append(pool.submit(job) if pool else job)
+
+            for n, job in enumerate(jobs, 1):
+                if isinstance(job, tuple):
+                    cache_hits += 1
+                    yield job
+                    continue
 
+                text, region, ocr_texts, timings = job.result() if pool else job()
+                self.stage_times.update(timings)
+                if cache is not None:
+                    for ocr_region, ocr_text in ocr_texts.items():
+                        page_dpi = self.header_dpi if ocr_region == 'header' else self.dpi
+                        cache.put(n, self._cache_region(ocr_region), page_dpi, ocr_text)
+                if region == 'full' and 'header' in ocr_texts and self._header_is_conclusive(ocr_texts['header']):
+                    text, region = ocr_texts['header'], 'header'
+                yield text, region
+        finally:
+            for job in jobs:
+                if hasattr(job, 'cancel'):
+                    job.cancel()
+            if own_pool:
+                own_pool.shutdown(cancel_futures=True)
+            if cache is not None:
+                cache.save()
+                self.logger.info(f"OCR cache: {cache_hits}/{page_count} pages served from {cache.path.name}")
+
+    def _page_texts(self, file_path):
+        """Yields (text, region) for every page of file_path, from the OCR cache where possible."""
+        page_count = pdfinfo_from_path(file_path)["Pages"]
+        self.logger.info(
+            f"Rasterizing and OCRing {page_count} pages at {self.dpi} DPI with {self.workers} worker(s) "
+            f"({file_path.stat().st_size / (1024 * 1024):.2f} MB)...")
+        cache = OcrCache(self.cache_dir, file_path) if self.cache_dir else None
+        yield from self._ocr_pages(file_path, page_count, cache)
+
+    def _assign_pages(self, pages, overrides=None):
+        """
+        Runs the part-assignment state machine over (text, region) pairs in page order.
+        overrides maps 0-based page indexes to instrument names chosen during a deferred review.
+        Returns (parts, deferred, raw_ocr_dump) where deferred lists the pages that still need
+        review as [{'page': index, 'text': ocr_text}] (always empty in interactive mode).
+        """
+        overrides = overrides or {}
+        deferred = []
         parts = {}
         last_inst = None
         last_detected_page = -1
@@ -202,17 +640,21 @@ class BigBandChartSplitter:
         raw_ocr_dump = []
 
         part_instance_count = {}
+        header_pages = 0
 
-        for i, img in enumerate(images):
-            # Only downcase the string now; no regex normalization
-            text = pytesseract.image_to_string(img.convert('L'), config='--psm 3').lower()
-            raw_ocr_dump.append(f"PAGE {i + 1}:\n{text}")
+        for i, (text, region) in enumerate(pages):
+            if region == 'header':
+                header_pages += 1
+                raw_ocr_dump.append(f"PAGE {i + 1} (header only):\n{text}")
+            else:
+                raw_ocr_dump.append(f"PAGE {i + 1}:\n{text}")
+            match_start = time.perf_counter()
 
             detected = self._get_best_match(text)
             is_first_page_of_part = bool(re.search(r'\b(arranged by|music by|words by|composed by)\b', text))
 
             self.logger.debug(
-                f"Page {i + 1} OCR length={len(text)}; detected={detected}; is_first_page={is_first_page_of_part}")
+                f"Page {i + 1} OCR region={region} length={len(text)}; detected={detected}; is_first_page={is_first_page_of_part}")
 
             is_new_detection = False
             current_inst = None
@@ -254,9 +696,16 @@ class BigBandChartSplitter:
 
             if is_new_detection and current_inst == 'Trombone 4' and last_inst == 'Trombone 2':
                 current_inst = 'Trombone 3'
+            self.stage_times['match'] += time.perf_counter() - match_start
 
             if current_inst is None:
-                current_inst = self._run_wizard(i, text)
+                if i in overrides:
+                    current_inst = overrides[i]
+                elif self.interactive:
+                    current_inst = self._run_wizard(i, text)
+                else:
+                    deferred.append({'page': i, 'text': text})
+                    self.logger.warning(f"Page {i + 1} | Unrecognized, deferred to review queue")
                 if current_inst:
                     is_new_detection = True
 
@@ -270,6 +719,27 @@ class BigBandChartSplitter:
 
             self.logger.info(f"Page {i + 1} | Assigned: {current_inst}")
 
+        if self.header_first:
+            self.logger.info(f"Header pass resolved {header_pages}/{len(raw_ocr_dump)} pages without full-page OCR")
+        return parts, deferred, raw_ocr_dump
+
+    def process_file(self, file_path, dump=False, overrides=None, pages=None):
+        """
+        Splits one PDF into part files. overrides maps 0-based page indexes to instrument names
+        chosen during a deferred review; pages reuses already-read (text, region) pairs instead
+        of OCRing the file again. Returns the pages that still need review (see _assign_pages).
+        """
+        self.logger.info(f"Starting processing for: {file_path.name}")
+        out_dir = file_path.parent / f"{file_path.stem}_parts"
+        out_dir.mkdir(exist_ok=True)
+
+        start = time.perf_counter()
+        parts, deferred, raw_ocr_dump = self._assign_pages(
+            self._page_texts(file_path) if pages is None else pages, overrides)
+        elapsed = time.perf_counter() - start
+        self.logger.info(f"OCR and assignment finished in {elapsed:.1f}s "
+                         f"({len(raw_ocr_dump) / max(elapsed, 1e-6):.2f} pages/sec)")
+
         if dump:
             dump_path = out_dir / f"{file_path.stem}_OCR_DUMP.txt"
             with open(dump_path, "w", encoding="utf-8") as f:
@@ -277,36 +747,185 @@ class BigBandChartSplitter:
             self.logger.info(f"Dump saved to {dump_path}")
 
         self._save(file_path, out_dir, parts)
+        return deferred
+
+    @staticmethod
+    def _load_json(path, default):
+        if path.exists():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+        return default
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _batch_files(self, dir_path):
+        """All PDFs under dir_path, skipping split output in *_parts folders."""
+        return sorted(
+            p for p in dir_path.rglob('*.pdf')
+            if not any(part.endswith('_parts') for part in p.relative_to(dir_path).parts[:-1])
+        )
+
+    def process_batch(self, dir_path, dump=False, restart=False):
+        """
+        Splits every PDF under dir_path on one shared OCR worker pool. Pages that would need the
+        wizard go to .split_review.json instead of blocking the run (see review_batch), and
+        .split_batch_state.json records finished files so an interrupted batch resumes where it stopped.
+        """
+        state_path = dir_path / '.split_batch_state.json'
+        review_path = dir_path / '.split_review.json'
+        state = {} if restart else self._load_json(state_path, {})
+        review = self._load_json(review_path, {})
+
+        files = self._batch_files(dir_path)
+        todo = []
+        for f in files:
+            key = str(f.relative_to(dir_path))
+            stat = f.stat()
+            if state.get(key) != [stat.st_size, stat.st_mtime]:
+                todo.append((key, f))
+        self.logger.info(f"Batch: {len(files)} PDFs found, {len(files) - len(todo)} already done, {len(todo)} to process")
+
+        interactive = self.interactive
+        self.interactive = False
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                self._pool = pool
+                for n, (key, f) in enumerate(todo, 1):
+                    self.logger.info(f"Batch [{n}/{len(todo)}] {key}")
+                    try:
+                        deferred = self.process_file(f, dump=dump)
+                    except Exception as e:
+                        self.logger.error(f"Failed to process {key}: {e}")
+                        continue
+
+                    if deferred:
+                        review[key] = deferred
+                    else:
+                        review.pop(key, None)
+                    stat = f.stat()
+                    state[key] = [stat.st_size, stat.st_mtime]
+                    self._write_json(review_path, review)
+                    self._write_json(state_path, state)
+        finally:
+            self._pool = None
+            self.interactive = interactive
+
+        pending = sum(len(pages) for pages in review.values())
+        if pending:
+            self.logger.info(f"{pending} page(s) across {len(review)} file(s) need review. Re-run with --review.")
+
+    def review_batch(self, dir_path):
+        """Runs the wizard over deferred pages, then re-splits each reviewed file with the answers applied."""
+        review_path = dir_path / '.split_review.json'
+        review = self._load_json(review_path, {})
+        if not review:
+            self.logger.info("Review queue is empty.")
+            return
+
+        interactive = self.interactive
+        self.interactive = False
+        try:
+            for key in list(review):
+                print(f"\n### Reviewing {key}")
+                file_path = dir_path / key
+                overrides = {}
+                deferred = review[key]
+                # Answer one page at a time and re-run assignment: a single answer (or a newly
+                # learned alias) usually resolves the pages that follow it. The file is read and
+                # OCR'd once; each re-run only repeats the assignment over the stored page texts.
+                pages = list(self._page_texts(file_path))
+                while deferred:
+                    entry = deferred[0]
+                    overrides[entry['page']] = self._run_wizard(entry['page'], entry['text'])
+                    _, deferred, _ = self._assign_pages(pages, overrides)
+
+                deferred = self.process_file(file_path, overrides=overrides, pages=pages)
+                if deferred:
+                    review[key] = deferred
+                else:
+                    review.pop(key)
+                self._write_json(review_path, review)
+        finally:
+            self.interactive = interactive
 
     def _sanitize_filename(self, name):
         return re.sub(r'[^a-zA-Z0-9]', '_', name)
 
     def _save(self, source, out_dir, parts):
-        reader = PdfReader(source)
         pdf_title = self._sanitize_filename(source.stem)
-
-        for name, pages in parts.items():
-            writer = PdfWriter()
-            for p in pages:
-                writer.add_page(reader.pages[p])
-
-            clean_part_name = self._sanitize_filename(name)
-            out_filename = f"{clean_part_name}_{pdf_title}.pdf"
-            out_file = out_dir / out_filename
-
-            with open(out_file, "wb") as f:
-                writer.write(f)
-            self.logger.info(f"Saved {out_filename} ({len(pages)} pages)")
+        jobs = [
+            (out_dir / f"{self._sanitize_filename(name)}_{pdf_title}.pdf", pages)
+            for name, pages in parts.items()
+        ]
+        if not jobs:
+            return
+
+        # Spread parts over the workers, biggest first, so each worker reads the source once
+        groups = [[] for _ in range(max(1, min(self.workers, len(jobs))))]
+        loads = [0] * len(groups)
+        for job in sorted(jobs, key=lambda j: len(j[1]), reverse=True):
+            g = loads.index(min(loads))
+            groups[g].append(job)
+            loads[g] += len(job[1])
+
+        start = time.perf_counter()
+        if len(groups) == 1:
+            results = [_write_part_files(source, groups[0], self.compress)]
+        elif self._pool is not None:
+            futures = [self._pool.submit(_write_part_files, source, g, self.compress) for g in groups]
+            results = [f.result() for f in futures]
+        else:
+            with ProcessPoolExecutor(max_workers=len(groups)) as pool:
+                results = list(pool.map(_write_part_files, [source] * len(groups), groups, [self.compress] * len(groups)))
+
+        total_size = 0
+        for out_file, page_count, size in sorted(w for written in results for w in written):
+            total_size += size
+            self.logger.info(f"Saved {out_file.name} ({page_count} pages, {size / 1024:.0f} KB)")
+        elapsed = time.perf_counter() - start
+        self.stage_times['write'] += elapsed
+        self.logger.info(f"Wrote {len(jobs)} part files ({total_size / (1024 * 1024):.2f} MB) in {elapsed:.1f}s")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument('path', help='Path to the PDF file')
+    parser.add_argument('path', help='Path to a PDF file, or a directory of PDFs for batch mode')
     parser.add_argument('-c', '--config', default='instruments.yaml', help='Path to the YAML config file')
     parser.add_argument('-d', '--debug', action='store_true', help='Enable debug logging')
     parser.add_argument('--dump', action='store_true', help='Dump raw OCR text to a file')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Number of OCR worker processes (default: all CPU cores)')
+    parser.add_argument('--dpi', type=int, default=300, help='Rasterization DPI for OCR')
+    parser.add_argument('--header-first', action='store_true',
+                        help='OCR only the top band of each page at low DPI; fall back to full-page OCR when inconclusive')
+    parser.add_argument('--header-dpi', type=int, default=150, help='Rasterization DPI for the header pass')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore and do not update the per-page OCR cache')
+    parser.add_argument('--preprocess', action='store_true',
+                        help='Binarize and strip staff lines before OCR (the header pass is also cropped to the header text)')
+    parser.add_argument('--compress', action='store_true', help='Deflate page content streams in the part files')
+    parser.add_argument('--review', action='store_true',
+                        help='Batch mode: run the wizard over pages deferred by a previous batch run')
+    parser.add_argument('--restart', action='store_true', help='Batch mode: ignore the resume file and redo every PDF')
     args = parser.parse_args()
 
     level = logging.DEBUG if args.debug else logging.INFO
-    splitter = BigBandChartSplitter(config_path=args.config, log_level=level)
-    splitter.process_file(Path(args.path), dump=args.dump)
\ No newline at end of file
+    splitter = BigBandChartSplitter(config_path=args.config, log_level=level, workers=args.workers, dpi=args.dpi,
+                                    header_first=args.header_first, header_dpi=args.header_dpi,
+                                    cache_dir=False if args.no_cache else None, compress=args.compress,
+                                    preprocess=args.preprocess)
+    path = Path(args.path)
+    if path.is_dir():
+        if args.review:
+            splitter.review_batch(path)
+        else:
+            splitter.process_batch(path, dump=args.dump, restart=args.restart)
+    else:
+        splitter.process_file(path, dump=args.dump)
\ No newline at end of file
@@ -0,0 +1,192 @@
+import json
+import time
+import random
+import logging
+import argparse
+from pathlib import Path
+
+import yaml
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from music_part_splitter import BigBandChartSplitter
+
+
+# Titles and credits avoid words that appear in instrument aliases (bass, piano, score, ...)
+CHART_TITLES = [
+    "Blue Horizon", "Night Train Shuffle", "Corner Pocket", "Midnight Avenue",
+    "Satin Lights", "Hollow Moon", "Cherry Point", "Sunday Morning Stroll",
+]
+ARRANGERS = ["Sammy Nestico", "Thad Jones", "Neal Hefti", "Frank Foster", "Dave Wolpe"]
+
+
+class RecordingSplitter(BigBandChartSplitter):
+    """Splitter that keeps the page-to-part assignment of every file it saves."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.assignments = {}
+
+    def _save(self, source, out_dir, parts):
+        self.assignments[source] = parts
+        super()._save(source, out_dir, parts)
+
+
+class SplitterBenchmark:
+    """
+    Generates synthetic big band chart PDFs with known part headers (taken from the instruments
+    config) and runs BigBandChartSplitter over them headless, reporting throughput, per-stage
+    time and a truth-vs-assigned confusion matrix.
+    """
+    def __init__(self, config_path, out_dir='bench_output', charts=3, max_pages_per_part=3,
+                 seed=0, **splitter_options):
+        self.config_path = Path(config_path)
+        self.out_dir = Path(out_dir)
+        self.corpus_dir = self.out_dir / 'corpus'
+        self.charts = charts
+        self.max_pages_per_part = max_pages_per_part
+        self.rng = random.Random(seed)
+        self.splitter_options = splitter_options
+
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            config = yaml.safe_load(f)
+        self.part_names = ['Conductor Score'] + [inst['name'] for inst in config.get('instruments', [])]
+
+    def _draw_page(self, pdf, part_label, title=None, credit=None):
+        """Draws one letter-size page: part label top-left, optional title/credit, and ten staves of notation."""
+        fig = plt.figure(figsize=(8.5, 11))
+        if part_label:
+            fig.text(0.06, 0.965, part_label, fontsize=14, ha='left', va='top')
+        if title:
+            fig.text(0.5, 0.965, title, fontsize=22, ha='center', va='top', weight='bold')
+        if credit:
+            fig.text(0.94, 0.93, credit, fontsize=11, ha='right', va='top')
+
+        ax = fig.add_axes([0.06, 0.04, 0.88, 0.84])
+        ax.set_xlim(0, 100)
+        ax.set_ylim(0, 100)
+        ax.axis('off')
+        for staff in range(10):
+            top = 98 - staff * 9.8
+            for line in range(5):
+                ax.plot([0, 100], [top - line * 1.0] * 2, color='black', linewidth=0.6)
+            ax.vlines([0, 25, 50, 75, 100], top - 4.0, top, color='black', linewidth=0.8)
+            xs = [self.rng.uniform(2, 98) for _ in range(16)]
+            ys = [top - self.rng.randint(0, 8) * 0.5 for _ in xs]
+            ax.scatter(xs, ys, s=16, color='black')
+        pdf.savefig(fig)
+        plt.close(fig)
+
+    def generate_chart(self, index):
+        """Writes one chart PDF and returns (path, truth) where truth[i] is the part on page i."""
+        self.corpus_dir.mkdir(parents=True, exist_ok=True)
+        path = self.corpus_dir / f"bench_chart_{index + 1:02d}.pdf"
+        title = CHART_TITLES[index % len(CHART_TITLES)]
+        credit = f"Arranged by {self.rng.choice(ARRANGERS)}"
+
+        truth = []
+        with PdfPages(path) as pdf:
+            for name in self.part_names:
+                for p in range(self.rng.randint(1, self.max_pages_per_part)):
+                    if p == 0:
+                        self._draw_page(pdf, name, title=title, credit=credit)
+                    else:
+                        # Continuation pages only sometimes repeat the part name
+                        self._draw_page(pdf, name if self.rng.random() < 0.5 else None)
+                    truth.append(name)
+        return path, truth
+
+    def run(self):
+        gen_start = time.perf_counter()
+        corpus = [self.generate_chart(i) for i in range(self.charts)]
+        gen_time = time.perf_counter() - gen_start
+        with open(self.corpus_dir / 'truth.json', 'w', encoding='utf-8') as f:
+            json.dump({p.name: truth for p, truth in corpus}, f, indent=2)
+
+        splitter = RecordingSplitter(config_path=self.config_path, interactive=False, **self.splitter_options)
+        rows = []
+        per_chart = []
+        run_start = time.perf_counter()
+        for path, truth in corpus:
+            chart_start = time.perf_counter()
+            splitter.process_file(path)
+            chart_time = time.perf_counter() - chart_start
+
+            assigned = ['(unassigned)'] * len(truth)
+            for name, pages in splitter.assignments.get(path, {}).items():
+                for p in pages:
+                    assigned[p] = name
+            correct = sum(t == a for t, a in zip(truth, assigned))
+            per_chart.append({
+                'chart': path.name, 'pages': len(truth), 'seconds': round(chart_time, 3),
+                'accuracy': round(correct / len(truth), 4),
+            })
+            rows.extend({'chart': path.name, 'page': i + 1, 'truth': t, 'assigned': a}
+                        for i, (t, a) in enumerate(zip(truth, assigned)))
+        run_time = time.perf_counter() - run_start
+
+        return self._report(pd.DataFrame(rows), per_chart, run_time, gen_time, dict(splitter.stage_times))
+
+    def _report(self, pages_df, per_chart, run_time, gen_time, stage_times):
+        total_pages = len(pages_df)
+        confusion = pd.crosstab(pages_df['truth'], pages_df['assigned'])
+        labels = self.part_names + ['(unassigned)']
+        confusion = confusion.reindex(index=[n for n in labels if n in confusion.index],
+                                      columns=[n for n in labels if n in confusion.columns])
+        summary = {
+            'charts': len(per_chart),
+            'pages': total_pages,
+            'wall_seconds': round(run_time, 3),
+            'pages_per_sec': round(total_pages / run_time, 3) if run_time else None,
+            'accuracy': round(float((pages_df['truth'] == pages_df['assigned']).mean()), 4),
+            'corpus_generation_seconds': round(gen_time, 3),
+            'stage_seconds': {k: round(v, 3) for k, v in sorted(stage_times.items())},
+            'splitter_options': {k: str(v) for k, v in self.splitter_options.items()},
+            'per_chart': per_chart,
+        }
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.out_dir / 'bench_report.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        confusion.to_csv(self.out_dir / 'confusion_matrix.csv')
+        pages_df.to_csv(self.out_dir / 'page_assignments.csv', index=False)
+
+        print(f"\n--- Splitter Benchmark: {summary['charts']} charts, {total_pages} pages ---")
+        print(f"Throughput: {summary['pages_per_sec']} pages/sec ({summary['wall_seconds']}s wall)")
+        print(f"Accuracy:   {summary['accuracy']:.1%}")
+        print("Stage time (rasterize/ocr are summed across workers):")
+        for stage, seconds in summary['stage_seconds'].items():
+            print(f"  {stage:<10} {seconds:>9.2f}s")
+        errors = pages_df[pages_df['truth'] != pages_df['assigned']]
+        if not errors.empty:
+            print("\nMisassigned pages (truth -> assigned):")
+            for (t, a), n in errors.groupby(['truth', 'assigned']).size().sort_values(ascending=False).items():
+                print(f"  {t} -> {a}: {n}")
+        print(f"\nReport, confusion matrix and page assignments saved to {self.out_dir}")
+        return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Accuracy/throughput benchmark for music_part_splitter.py')
+    parser.add_argument('-c', '--config', default='music_cache/instruments.yaml', help='Path to the YAML config file')
+    parser.add_argument('-o', '--out', default='bench_output', help='Directory for the corpus and reports')
+    parser.add_argument('-n', '--charts', type=int, default=3, help='Number of synthetic charts to generate')
+    parser.add_argument('--max-pages', type=int, default=3, help='Maximum pages per part')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--workers', type=int, default=None, help='OCR worker processes')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--header-first', action='store_true')
+    parser.add_argument('--preprocess', action='store_true')
+    parser.add_argument('--use-cache', action='store_true', help='Allow OCR cache hits (measures re-run speed)')
+    parser.add_argument('-d', '--debug', action='store_true', help='Show splitter logging')
+    args = parser.parse_args()
+
+    SplitterBenchmark(
+        args.config, out_dir=args.out, charts=args.charts, max_pages_per_part=args.max_pages, seed=args.seed,
+        workers=args.workers, dpi=args.dpi, header_first=args.header_first, preprocess=args.preprocess,
+        cache_dir=None if args.use_cache else False,
+        log_level=logging.DEBUG if args.debug else logging.WARNING,
+    ).run()
@@ -1,66 +1,654 @@
-import os, io, re, time, logging, requests, yfinance as yf, pandas as pd, numpy as np
-from datetime import datetime, date, timedelta
+import os, io, re, json, time, sqlite3, hashlib, argparse, threading, logging, requests, yfinance as yf, pandas as pd, numpy as np
+from datetime import datetime, date, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+from collections import Counter, defaultdict
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from playwright.sync_api import sync_playwright
 from bs4 import BeautifulSoup
 import random
 
+try:
+    import lxml.html
+except ImportError: # Symbol scraping falls back to BeautifulSoup's html.parser
+    lxml = None
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR) # Core-font weight notices
+except ImportError: # PDF export then needs the Chromium backend
+    plt = None
+
+try:
+    from yfinance.exceptions import YFRateLimitError
+except ImportError: # Older yfinance releases surface throttling only in the message
+    YFRateLimitError = ()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 logging.getLogger('yfinance').setLevel(logging.CRITICAL)
 
+class PriceHistoryStore:
+    """
+    SQLite store of daily split-adjusted OHLC and cash dividends per ticker, keyed by (symbol, date).
+    Prices are kept unadjusted for dividends so incremental top-ups never need re-basing;
+    total returns are rebuilt from close + dividends when metrics are computed.
+    Also holds the last fetched fundamentals (.info subset) per ticker with their fetch time.
+    """
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS prices (
+                    symbol TEXT NOT NULL, date TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL, volume REAL, dividends REAL,
+                    PRIMARY KEY (symbol, date)
+                ) WITHOUT ROWID""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS index_pages (
+                    url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT,
+                    symbols TEXT NOT NULL, checked_at REAL NOT NULL
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS fundamentals (
+                    symbol TEXT PRIMARY KEY, fetched_at REAL NOT NULL, info TEXT NOT NULL
+                )""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def last_closes(self):
+        """Returns {symbol: (last_date, close_on_that_date)}."""
+        with self._connect() as conn:
+            rows = conn.execute("""
+                SELECT p.symbol, p.date, p.close FROM prices p
+                JOIN (SELECT symbol, MAX(date) AS date FROM prices GROUP BY symbol) m
+                  ON p.symbol = m.symbol AND p.date = m.date""").fetchall()
+        return {sym: (d, close) for sym, d, close in rows}
+
+    def upsert(self, frame):
+        if frame.empty: return
+        cols = ['symbol', 'date', 'open', 'high', 'low', 'close', 'volume', 'dividends']
+        rows = frame[cols].astype(object).where(frame[cols].notna(), None).itertuples(index=False, name=None)
+        with self._connect() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO prices ({', '.join(cols)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete(self, symbols):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM prices WHERE symbol = ?", [(s,) for s in symbols])
+
+    def prune(self, before):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM prices WHERE date < ?", (before,))
+
+    def load(self, symbols, since):
+        """Returns (closes, dividends) as wide date x symbol matrices for dates >= since."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT symbol, date, close, dividends FROM prices WHERE date >= ?", (since,)).fetchall()
+        df = pd.DataFrame(rows, columns=['symbol', 'date', 'close', 'dividends'])
+        df = df[df['symbol'].isin(set(symbols))]
+        if df.empty: return pd.DataFrame(), pd.DataFrame()
+        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d')
+        closes = df.pivot(index='date', columns='symbol', values='close').sort_index()
+        dividends = df.pivot(index='date', columns='symbol', values='dividends').reindex_like(closes).fillna(0.0)
+        return closes, dividends
+
+    def load_index_page(self, url):
+        """Returns the stored validators and symbols for an index page, or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT etag, last_modified, content_hash, symbols FROM index_pages WHERE url = ?",
+                               (url,)).fetchone()
+        if row is None: return None
+        etag, last_modified, content_hash, symbols = row
+        return {'etag': etag, 'last_modified': last_modified, 'content_hash': content_hash,
+                'symbols': json.loads(symbols)}
+
+    def save_index_page(self, url, etag, last_modified, content_hash, symbols):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO index_pages VALUES (?, ?, ?, ?, ?, ?)",
+                         (url, etag, last_modified, content_hash, json.dumps(symbols), time.time()))
+
+    def load_fundamentals(self, symbols):
+        """Returns {symbol: (fetched_at, info)} for the stored symbols among `symbols`."""
+        wanted = set(symbols)
+        with self._connect() as conn:
+            rows = conn.execute("SELECT symbol, fetched_at, info FROM fundamentals").fetchall()
+        return {sym: (fetched_at, json.loads(info)) for sym, fetched_at, info in rows if sym in wanted}
+
+    def save_fundamentals(self, fetched):
+        """Upserts {symbol: info} stamped with the current time."""
+        if not fetched: return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO fundamentals (symbol, fetched_at, info) VALUES (?, ?, ?)",
+                             [(sym, now, json.dumps(info)) for sym, info in fetched.items()])
+
+
+def _sector_neutral(score, sectors):
+    """Z-score of score within each sector (0 for single-member sectors)."""
+    grouped = score.groupby(sectors)
+    return ((score - grouped.transform('mean')) / grouped.transform('std')).fillna(0.0)
+
+
+# name -> (description, score over the factor frame); higher is better
+RANKING_STRATEGIES = {
+    'Blended Score': ("Sharpe Ratio &times; Dividend Yield",
+                      lambda f: f['Sharpe Ratio'] * f['Div Yield (%)']),
+    'Sortino Yield': ("Sortino Ratio &times; Dividend Yield (penalizes only downside volatility)",
+                      lambda f: f['Sortino Ratio'] * f['Div Yield (%)']),
+    'Drawdown-Adjusted Yield': ("Dividend Yield &times; (1 + 1Y Max Drawdown)",
+                                lambda f: f['Div Yield (%)'] * (1 + f['Max Drawdown (%)'] / 100)),
+    'Chowder Score': ("Dividend Yield + Dividend Growth (forward vs trailing annual rate), Sharpe &gt; 0",
+                      lambda f: (f['Div Yield (%)'] + f['Div Growth (%)'].clip(-50, 50)).where(f['Sharpe Ratio'] > 0)),
+    'Sector-Neutral Blend': ("Blended Score z-scored within each sector",
+                             lambda f: _sector_neutral(f['Sharpe Ratio'] * f['Div Yield (%)'], f['Sector'])),
+}
+
+
+class FetchFailed(Exception):
+    pass
+
+
+class Throttled(FetchFailed):
+    """A soft throttle: the call "succeeded" but Yahoo sent a stub payload instead of data."""
+
+
+class AdaptiveRateLimiter:
+    """
+    Token-bucket rate limiter with AIMD concurrency control for Yahoo Finance calls.
+    Every success nudges the concurrency limit up by 1/limit (about +1 per round of requests) and
+    the rate up by rate_step; a throttle (HTTP 429, rate-limit error, timeout or Throttled) halves both, at
+    most once per cooldown so a burst of in-flight 429s counts as one signal. Failed calls are
+    retried with full-jitter exponential backoff and, when out of retries, recorded in `failures`
+    for the run's failure report. Shared state is only touched under `cond`.
+    """
+    THROTTLE_MARKERS = ('429', 'too many requests', 'rate limit', 'timed out', 'timeout')
+
+    def __init__(self, rate=8.0, min_rate=0.5, max_rate=20.0, rate_step=0.25, concurrency=4, max_concurrency=16,
+                 max_retries=4, backoff_base=1.0, backoff_cap=30.0, cooldown=2.0):
+        self.rate, self.min_rate, self.max_rate, self.rate_step = rate, min_rate, max_rate, rate_step
+        self.cooldown = cooldown
+        self.decreased_at = float('-inf')
+        self.limit, self.max_concurrency = float(concurrency), max_concurrency
+        self.max_retries, self.backoff_base, self.backoff_cap = max_retries, backoff_base, backoff_cap
+        self.tokens = 1.0
+        self.refilled_at = time.monotonic()
+        self.in_flight = 0
+        self.cond = threading.Condition()
+        self.stats = Counter()
+        self.failures = {}
+
+    def _is_throttle(self, exc):
+        if isinstance(exc, (Throttled, YFRateLimitError, requests.exceptions.Timeout)): return True
+        if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+            if exc.response.status_code == 429: return True
+        msg = str(exc).lower()
+        return any(m in msg for m in self.THROTTLE_MARKERS)
+
+    def _acquire(self):
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.refilled_at) * self.rate)
+                self.refilled_at = now
+                if self.in_flight < int(self.limit) and self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    self.in_flight += 1
+                    return
+                wait = (1.0 - self.tokens) / self.rate if self.tokens < 1.0 else None
+                self.cond.wait(timeout=wait)
+
+    def _release(self, outcome):
+        throttled = outcome == 'throttled'
+        with self.cond:
+            self.in_flight -= 1
+            self.stats[outcome] += 1
+            if throttled:
+                now = time.monotonic()
+                if now - self.decreased_at >= self.cooldown:
+                    self.decreased_at = now
+                    self.limit = max(1.0, self.limit / 2)
+                    self.rate = max(self.min_rate, self.rate / 2)
+            elif outcome == 'ok':
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+                self.rate = min(self.max_rate, self.rate + self.rate_step)
+            self.cond.notify_all()
+
+    def call(self, key, fn, *args, **kwargs):
+        """Runs fn under the limiter with retries; raises FetchFailed once retries are exhausted."""
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            outcome = 'ok'
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                outcome = 'throttled' if self._is_throttle(e) else 'error'
+                error = e
+            finally:
+                self._release(outcome)
+            if attempt < self.max_retries:
+                with self.cond:
+                    self.stats['retries'] += 1
+                time.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+
+        self.record_failure(key, outcome, f"{type(error).__name__}: {error}"[:300], attempts=self.max_retries + 1)
+        raise FetchFailed(key) from error
+
+    def record_failure(self, key, kind, error, attempts=0):
+        with self.cond:
+            self.failures[key] = {'kind': kind, 'error': error, 'attempts': attempts}
+
+    def note_fallback(self, key, fallback):
+        with self.cond:
+            if key in self.failures: self.failures[key]['fallback'] = fallback
+
+    def snapshot(self):
+        """Returns (stats, failures, rate, limit) copied under the lock."""
+        with self.cond:
+            return dict(self.stats), {k: dict(v) for k, v in self.failures.items()}, self.rate, self.limit
+
+
+class ChromiumPdfBackend:
+    """
+    Prints the HTML report with headless Chromium. The browser is launched on first use and kept
+    open, so only the first report of a process pays the startup cost; call close() when done.
+    """
+    name = 'chromium'
+
+    def __init__(self):
+        self._playwright = None
+        self._browser = None
+
+    def render(self, html, sections, title, pdf_path):
+        if self._browser is None:
+            self._playwright = sync_playwright().start()
+            try:
+                self._browser = self._playwright.chromium.launch()
+            except Exception:
+                # A driver left running blocks every later sync_playwright().start() in this process
+                self.close()
+                raise
+        page = self._browser.new_page()
+        try:
+            page.set_content(html)
+            page.pdf(path=pdf_path, format='A4', landscape=True, print_background=True)
+        finally:
+            page.close()
+
+    def close(self):
+        try:
+            if self._browser is not None:
+                self._browser.close()
+        finally:
+            if self._playwright is not None:
+                self._playwright.stop()
+            self._browser = self._playwright = None
+
+
+class MatplotlibPdfBackend:
+    """
+    Draws the report tables straight to PDF with matplotlib. No browser is involved and text uses
+    the PDF core fonts (nothing to embed), so a report renders in milliseconds; styling is
+    simpler than the HTML version.
+    """
+    name = 'matplotlib'
+    rows_per_page = 30
+    line_height = 0.028 # Figure fraction per table row
+
+    def render(self, html, sections, title, pdf_path):
+        with matplotlib.rc_context({'pdf.use14corefonts': True, 'font.family': 'sans-serif'}), PdfPages(pdf_path) as pdf:
+            for heading, table in sections:
+                cells = table.astype(object).where(table.notna(), '')
+                cells = cells.apply(lambda col: col.map(lambda v: f"{v:,.2f}" if isinstance(v, float) else str(v)))
+                if 'Name' in cells:
+                    cells['Name'] = cells['Name'].str.slice(0, 30)
+                # Column widths from the longest cell, in characters
+                widths = np.array([max(len(str(c)), cells[c].str.len().max() if len(cells) else 0) + 2
+                                   for c in cells.columns], dtype=float)
+                lefts = 0.033 + np.concatenate([[0], np.cumsum(widths)[:-1]]) / widths.sum() * 0.94
+
+                for start in range(0, max(len(cells), 1), self.rows_per_page):
+                    chunk = cells.iloc[start:start + self.rows_per_page]
+                    fig = plt.figure(figsize=(11.69, 8.27)) # A4 landscape
+                    fig.text(0.03, 0.96, title, fontsize=14, weight='bold', va='top')
+                    fig.text(0.03, 0.92, f"{heading} ({start + 1}-{start + len(chunk)} of {len(cells)})",
+                             fontsize=10, color='#555555', va='top')
+                    # Row r (0 = header) spans [top - (r + 1) * lh, top - r * lh]
+                    top, lh = 0.87, self.line_height
+                    for r in range(0, len(chunk) + 1, 2):
+                        fig.patches.append(plt.Rectangle((0.03, top - (r + 1) * lh), 0.94, lh, transform=fig.transFigure,
+                                                         color='#34495e' if r == 0 else '#f2f2f2'))
+                    for x, col in zip(lefts, chunk.columns):
+                        fig.text(x, top - lh / 2, col, fontsize=8, color='white', weight='bold', va='center')
+                        for r, value in enumerate(chunk[col], 1):
+                            fig.text(x, top - (r + 0.5) * lh, value, fontsize=8, va='center')
+                    pdf.savefig(fig)
+                    plt.close(fig)
+
+    def close(self):
+        pass
+
+
+class YFinanceBarSource:
+    """Latest daily bar per ticker from Yahoo Finance; today's bar is the live, still-forming one."""
+    def __init__(self, report):
+        self.report = report
+
+    def latest_bars(self, symbols):
+        bars = self.report.download_ohlc(list(symbols), period="5d")
+        if bars.empty: return bars
+        return bars.sort_values('date').groupby('symbol').tail(1)[['symbol', 'date', 'close', 'dividends']]
+
+
+class StubBarSource:
+    """
+    Offline stand-in for YFinanceBarSource: every poll moves each requested ticker by a seeded
+    random step; next_session() starts a new trading day. Enough to drive StreamingRanker in tests.
+    """
+    def __init__(self, start_prices, session, seed=0, volatility=0.01):
+        self.prices = {s: float(p) for s, p in start_prices.items()}
+        self.session = pd.Timestamp(session)
+        self.rng = np.random.default_rng(seed)
+        self.volatility = volatility
+
+    def next_session(self):
+        self.session += pd.offsets.BDay(1)
+
+    def latest_bars(self, symbols):
+        symbols = [s for s in symbols if s in self.prices]
+        steps = 1 + self.rng.normal(0, self.volatility, len(symbols))
+        for s, step in zip(symbols, steps):
+            self.prices[s] *= step
+        return pd.DataFrame({'symbol': symbols, 'date': self.session.strftime('%Y-%m-%d'),
+                             'close': [self.prices[s] for s in symbols], 'dividends': 0.0})
+
+
+class StreamingRanker:
+    """
+    Keeps the ranked universe in memory and refreshes it from recent bars only.
+
+    Each ticker has a ring buffer of its last `window` completed daily total returns plus running
+    sums of r and r^2, so Sharpe updates in O(1) per bar. A bar for a newer session than the last
+    completed one is provisional: it counts as the newest observation until a later session
+    arrives, at which point it is committed to the buffer (evicting the oldest return). Each poll
+    covers the current top-N plus a rotating slice of the rest; on_change runs only when the
+    top-N order changes.
+    """
+    def __init__(self, universe, closes, dividends, source, on_change=None, top_n=25, slice_size=50,
+                 window=252, rf_rate=0.04, resync_every=1000):
+        self.universe = universe.set_index('Symbol')
+        self.symbols = list(self.universe.index)
+        self.col = {s: i for i, s in enumerate(self.symbols)}
+        self.source = source
+        self.on_change = on_change
+        self.top_n, self.slice_size, self.window = top_n, slice_size, window
+        self.rf_rate = rf_rate
+        self.resync_every = resync_every
+        self._commits = 0
+        self._cursor = 0
+        self.ranking = ()
+
+        n = len(self.symbols)
+        closes = closes.reindex(columns=self.symbols)
+        dividends = dividends.reindex_like(closes).fillna(0.0)
+        prices = closes.to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = (prices[1:] + dividends.to_numpy(dtype=float)[1:]) / prices[:-1] - 1
+        recent = returns[-window:]
+        self.buf = np.full((window, n), np.nan)
+        self.buf[window - len(recent):] = recent
+        self.pos = np.zeros(n, dtype=int) # Next slot to overwrite (the oldest return)
+        self._resync()
+
+        # Base = each ticker's last stored close. Tickers without one (e.g. the history DB is still
+        # empty) start with no base; their first committed bar becomes it
+        self.base_close = np.full(n, np.nan)
+        self.base_date = np.full(n, '', dtype=object)
+        valid = closes.notna().to_numpy()
+        has_base = valid.any(axis=0)
+        if has_base.any():
+            last_row = len(valid) - 1 - valid[::-1].argmax(axis=0)
+            self.base_close[has_base] = prices[last_row[has_base], np.flatnonzero(has_base)]
+            self.base_date[has_base] = closes.index[last_row[has_base]].strftime('%Y-%m-%d')
+        self.prov_date = np.full(n, '', dtype=object)
+        self.prov_close = np.full(n, np.nan)
+        self.prov_div = np.zeros(n)
+        # Annual dividend per share, implied by the batch yield and price
+        self.div_rate = (self.universe['Div Yield (%)'] * self.universe['Price'] / 100).to_numpy(dtype=float)
+
+    def _resync(self):
+        """Recomputes the running sums exactly from the buffer (bounds floating-point drift)."""
+        self.s1 = np.nansum(self.buf, axis=0)
+        self.s2 = np.nansum(self.buf ** 2, axis=0)
+        self.count = np.sum(~np.isnan(self.buf), axis=0)
+
+    def _commit(self, cols):
+        """Moves the provisional bar of cols into the ring buffer as a completed session."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = (self.prov_close[cols] + self.prov_div[cols]) / self.base_close[cols] - 1
+        slot = self.pos[cols]
+        old = self.buf[slot, cols]
+        had_old = ~np.isnan(old)
+        self.s1[cols] -= np.where(had_old, old, 0.0)
+        self.s2[cols] -= np.where(had_old, old ** 2, 0.0)
+        self.count[cols] -= had_old
+        self.buf[slot, cols] = r
+        has_new = np.isfinite(r)
+        self.buf[slot[~has_new], cols[~has_new]] = np.nan
+        self.s1[cols] += np.where(has_new, r, 0.0)
+        self.s2[cols] += np.where(has_new, r ** 2, 0.0)
+        self.count[cols] += has_new
+        self.pos[cols] = (slot + 1) % self.window
+
+        self.base_close[cols] = self.prov_close[cols]
+        self.base_date[cols] = self.prov_date[cols]
+        self.prov_date[cols] = ''
+        self.prov_close[cols] = np.nan
+        self.prov_div[cols] = 0.0
+        self._commits += len(cols)
+        if self._commits >= self.resync_every:
+            self._resync()
+            self._commits = 0
+
+    def apply_bars(self, bars):
+        """Folds a frame of (symbol, date, close, dividends) bars into the rolling state."""
+        bars = bars[bars['symbol'].isin(self.col)].drop_duplicates('symbol', keep='last')
+        if bars.empty: return
+        cols = bars['symbol'].map(self.col).to_numpy()
+        dates = bars['date'].to_numpy(dtype=object)
+        closes = bars['close'].to_numpy(dtype=float)
+        divs = bars['dividends'].fillna(0.0).to_numpy(dtype=float)
+
+        has_prov = self.prov_date[cols] != ''
+        # A bar from a later session than the provisional one closes out the provisional session
+        rolls = has_prov & (dates > self.prov_date[cols])
+        if rolls.any():
+            self._commit(cols[rolls])
+        newer = dates > self.base_date[cols]
+        cols, dates, closes, divs = cols[newer], dates[newer], closes[newer], divs[newer]
+        self.prov_date[cols] = dates
+        self.prov_close[cols] = closes
+        self.prov_div[cols] = divs
+
+    def scores(self):
+        """Current Price, Div Yield (%), Sharpe Ratio and Blended Score for the whole universe."""
+        has_prov = ~np.isnan(self.prov_close)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.where(has_prov, (self.prov_close + self.prov_div) / self.base_close - 1, 0.0)
+            r = np.where(np.isfinite(r), r, 0.0)
+            s1, s2, n = self.s1 + r, self.s2 + r ** 2, self.count + has_prov
+            mean = s1 / n
+            var = (s2 - s1 * mean) / (n - 1)
+            ann_vol = np.sqrt(np.maximum(var, 0) * 252)
+            sharpe = np.where(ann_vol > 0, (mean * 252 - self.rf_rate) / ann_vol, -1.0)
+            price = np.where(has_prov, self.prov_close, self.base_close)
+            div_yield = self.div_rate / price * 100
+        scores = pd.DataFrame({'Price': price, 'Div Yield (%)': div_yield, 'Sharpe Ratio': sharpe},
+                              index=self.symbols)
+        eligible = (div_yield >= 1.0) & (div_yield <= 25) & (sharpe > 0)
+        scores['Blended Score'] = np.where(eligible, sharpe * div_yield, np.nan)
+        return scores
+
+    def current_ranking(self):
+        blended = self.scores()['Blended Score'].dropna()
+        return tuple(blended.nlargest(self.top_n).index)
+
+    def poll_targets(self):
+        """The current top-N plus the next rotating slice of everything else."""
+        top = set(self.ranking)
+        rest = [s for s in self.symbols if s not in top]
+        if not rest: return list(self.ranking)
+        start = self._cursor % len(rest)
+        chunk = (rest[start:] + rest[:start])[:self.slice_size]
+        self._cursor = start + len(chunk)
+        return list(self.ranking) + chunk
+
+    def step(self):
+        """One poll: fetch recent bars, update the rolling stats, re-render if the top-N changed."""
+        self.apply_bars(self.source.latest_bars(self.poll_targets()))
+        ranking = self.current_ranking()
+        changed = ranking != self.ranking
+        self.ranking = ranking
+        if changed and self.on_change is not None:
+            self.on_change(self)
+        return changed
+
+    def report_frame(self):
+        """Universe rows for the current top-N with live Price/Yield/Sharpe/Blended Score, rounded like the batch report."""
+        scores = self.scores().loc[list(self.ranking)].round(2)
+        rows = self.universe.loc[list(self.ranking)].drop(columns=scores.columns, errors='ignore')
+        return rows.join(scores).rename_axis('Symbol').reset_index()
+
+    def run(self, poll_seconds=60, cycles=None):
+        self.ranking = self.current_ranking()
+        if self.on_change is not None:
+            self.on_change(self)
+        n = 0
+        while cycles is None or n < cycles:
+            time.sleep(poll_seconds)
+            changed = self.step()
+            n += 1
+            logger.info(f"Stream poll {n}: {'ranking changed, report updated' if changed else 'ranking unchanged'}")
+
+
 class NyseTrendingReport:
     """
     Stabilized Dividend Report with Sharpe Ratio and Stale-if-Error Caching.
     Filters the S&P 500, 400, and 600 for reliable, high-yielding opportunities
     using a Blended Score (Sharpe Ratio * Dividend Yield).
     """
-    def __init__(self, cache_path='market_symbols.csv', data_cache_path='market_data_cache.csv'):
+    def __init__(self, cache_path='market_symbols.csv', data_cache_path='market_data_cache.csv',
+                 history_db='market_history.sqlite', pdf_backend='auto', keep_browser=False, market_api=None):
         self.cache_path = os.path.abspath(cache_path)
         self.data_cache_path = os.path.abspath(data_cache_path)
+        self.price_store = PriceHistoryStore(history_db)
+        # Anything with yfinance's download() and Ticker(symbol).info; the bench swaps in a replay backend
+        self.market_api = market_api or yf
+        self.history_days = 365
+        self.rebase_tolerance = 0.005 # Overlap-day close drift that signals a split re-base
+        self.session_settled = dtime(16, 30) # US/Eastern; bars for today are partial before this
+        self.live_bars = pd.DataFrame()
         self.cache_ttl = 4 * 3600
+        self.fundamentals_ttl = 24 * 3600 # Dividend rate, sector and names change rarely
         self.symbol_ttl = 7 * 24 * 3600
+        self.download_chunk = 200
+        self.min_history = 50
+        self.rf_rate = 0.04 # 4% Risk-Free Rate
+        self.limiter = AdaptiveRateLimiter()
+        self.failure_report_path = os.path.join(os.path.dirname(self.data_cache_path), 'fetch_failures.json')
+        # 'auto' uses a warm Chromium when the process renders repeatedly (keep_browser), otherwise
+        # matplotlib when installed, so a one-off report never pays browser startup
+        self.pdf_backend = pdf_backend
+        self.keep_browser = keep_browser
+        self._pdf_renderer = None
         self.market_data = pd.DataFrame()
         self.final_report = pd.DataFrame()
+        self.strategy_reports = {}
         self.symbol_index_map = {}
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'
         })
 
+    TICKER_HEADERS = ['Symbol', 'Ticker', 'Ticker symbol', 'Ticker Symbol']
+
+    @staticmethod
+    def _clean_symbol(text):
+        parts = text.split()
+        if not parts: return None
+        symbol = re.sub(r'[\.\/]', '-', parts[0].upper())
+        return symbol if 0 < len(symbol) < 7 else None
+
+    def _parse_symbol_tables(self, html):
+        """Extracts ticker symbols from every wikitable that has a Symbol/Ticker column."""
+        all_symbols = set()
+        if lxml is not None:
+            tree = lxml.html.fromstring(html)
+            # Cell text mirrors BeautifulSoup's get_text(strip=True): stripped strings joined with ''
+            text = lambda el: ''.join(t.strip() for t in el.itertext())
+            for table in tree.xpath("//table[contains(concat(' ', normalize-space(@class), ' '), ' wikitable ')]"):
+                rows = table.xpath('.//tr')
+                if not rows: continue
+                headers = [text(c) for c in rows[0].xpath('.//th | .//td')]
+                ticker_idx = next((i for i, h in enumerate(headers)
+                                   if any(x == h or x in h for x in self.TICKER_HEADERS)), -1)
+                if ticker_idx == -1: continue
+                for row in rows[1:]:
+                    cols = row.xpath('.//td')
+                    if len(cols) > ticker_idx:
+                        symbol = self._clean_symbol(text(cols[ticker_idx]))
+                        if symbol: all_symbols.add(symbol)
+            return sorted(all_symbols)
+
+        soup = BeautifulSoup(html, 'html.parser')
+        for table in soup.find_all('table', class_='wikitable'):
+            header_row = table.find('tr')
+            if not header_row: continue
+            headers = [th.get_text(strip=True) for th in header_row.find_all(['th', 'td'])]
+            ticker_idx = next((i for i, h in enumerate(headers)
+                               if any(x == h or x in h for x in self.TICKER_HEADERS)), -1)
+            if ticker_idx == -1: continue
+            for row in table.find_all('tr')[1:]:
+                cols = row.find_all('td')
+                if len(cols) > ticker_idx:
+                    symbol = self._clean_symbol(cols[ticker_idx].get_text(strip=True))
+                    if symbol: all_symbols.add(symbol)
+        return sorted(all_symbols)
+
     def _get_wikipedia_table(self, url):
-        """Robustly parse Wikipedia tables to find stock symbols."""
+        """
+        Fetches one index page with a conditional GET and returns its symbols. A 304, or a 200 whose
+        body hashes the same as last time, reuses the stored symbols without parsing; request
+        errors fall back to the stored symbols when there are any.
+        """
+        stored = self.price_store.load_index_page(url)
+        headers = {}
+        if stored:
+            if stored['etag']: headers['If-None-Match'] = stored['etag']
+            if stored['last_modified']: headers['If-Modified-Since'] = stored['last_modified']
         try:
-            resp = self.session.get(url, timeout=20)
+            resp = self.session.get(url, timeout=20, headers=headers)
+            if resp.status_code == 304 and stored:
+                self.price_store.save_index_page(url, stored['etag'], stored['last_modified'],
+                                                 stored['content_hash'], stored['symbols'])
+                return stored['symbols'], 'not modified'
             resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            all_symbols = []
-            for table in soup.find_all('table', class_='wikitable'):
-                header_row = table.find('tr')
-                if not header_row: continue
-                headers = [th.get_text(strip=True) for th in header_row.find_all(['th', 'td'])]
-                ticker_idx = -1
-                for i, h in enumerate(headers):
-                    if any(x == h or x in h for x in ['Symbol', 'Ticker', 'Ticker symbol', 'Ticker Symbol']):
-                        ticker_idx = i
-                        break
-                if ticker_idx != -1:
-                    for row in table.find_all('tr')[1:]:
-                        cols = row.find_all('td')
-                        if len(cols) > ticker_idx:
-                            text = cols[ticker_idx].get_text(strip=True)
-                            parts = text.split()
-                            if parts:
-                                symbol = parts[0].upper()
-                                symbol = re.sub(r'[\.\/]', '-', symbol)
-                                if 0 < len(symbol) < 7:
-                                    all_symbols.append(symbol)
-            return sorted(list(set(all_symbols)))
+            content_hash = hashlib.sha256(resp.content).hexdigest()
+            if stored and stored['content_hash'] == content_hash:
+                symbols, status = stored['symbols'], 'unchanged'
+            else:
+                symbols, status = self._parse_symbol_tables(resp.content), 'parsed'
+            if symbols:
+                self.price_store.save_index_page(url, resp.headers.get('ETag'), resp.headers.get('Last-Modified'),
+                                                 content_hash, symbols)
+            return symbols, status
         except Exception as e:
             logger.error(f"Error scraping {url}: {e}")
-            return []
+            return (stored['symbols'], 'stale') if stored else ([], 'failed')
 
     def get_all_symbols_with_indices(self):
         """Loads or scrapes S&P 500/400/600 symbols from Wikipedia."""
@@ -74,16 +662,18 @@ class NyseTrendingReport:
                         return cache_df['symbol'].tolist()
                 except Exception: pass
 
-        logger.info("Scraping fresh symbols from Wikipedia...")
+        logger.info("Checking Wikipedia for index constituents...")
         indices = {
             'S&P 500': 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies',
             'S&P 400': 'https://en.wikipedia.org/wiki/List_of_S%26P_400_companies',
             'S&P 600': 'https://en.wikipedia.org/wiki/List_of_S%26P_600_companies'
         }
+        with ThreadPoolExecutor(max_workers=len(indices)) as executor:
+            results = dict(zip(indices, executor.map(self._get_wikipedia_table, indices.values())))
+
         all_data = []
-        for name, url in indices.items():
-            symbols = self._get_wikipedia_table(url)
-            logger.info(f"Found {len(symbols)} symbols for {name}")
+        for name, (symbols, status) in results.items():
+            logger.info(f"Found {len(symbols)} symbols for {name} ({status})")
             for s in symbols: all_data.append({'symbol': s, 'index': name})
 
         if not all_data: return []
@@ -92,49 +682,219 @@ class NyseTrendingReport:
         self.symbol_index_map = dict(zip(df['symbol'], df['index']))
         return df['symbol'].tolist()
 
-    def fetch_single_ticker(self, symbol):
-        """Fetches and calculates metrics for a single stock."""
-        try:
-            time.sleep(random.uniform(0.1, 0.4)) # Polite jitter
-            t = yf.Ticker(symbol)
-
-            # 1. Price History for Sharpe Ratio
-            hist = t.history(period="1y")
-            if hist.empty or len(hist) < 50:
-                return None
-
-            price = hist['Close'].iloc[-1]
-            returns = hist['Close'].pct_change().dropna()
-            ann_return = returns.mean() * 252
-            ann_vol = returns.std() * np.sqrt(252)
-            rf_rate = 0.04 # 4% Risk-Free Rate
-            sharpe = (ann_return - rf_rate) / ann_vol if ann_vol > 0 else -1.0
-
-            # Skip unreliable or negative Sharpe ratios immediately
-            if sharpe <= 0: return None
-
-            # 2. Fundamental Dividend Data
-            info = t.info
-            active_rate = info.get('dividendRate') or info.get('trailingAnnualDividendRate') or 0
-            div_yield_pct = (active_rate / price) * 100
-
-            if div_yield_pct > 25 or div_yield_pct < 1.0: # Filter yields < 1%
-                return None
-
-            return {
-                'Symbol': symbol,
-                'Name': info.get('longName', info.get('shortName', 'N/A')),
-                'Price': price,
-                'Div Yield (%)': round(float(div_yield_pct), 2),
-                'Sharpe Ratio': round(float(sharpe), 2),
-                '52W High': info.get('fiftyTwoWeekHigh', 0),
-                'P/E Ratio': info.get('trailingPE', 'N/A'),
-                'Index': self.symbol_index_map.get(symbol, 'N/A'),
-                'Sector': info.get('sector', 'N/A')
-            }
-        except Exception:
+    def download_ohlc(self, symbols, **kwargs):
+        """Batched yf.download over symbol chunks; returns long rows of symbol/date/OHLC/volume/dividends."""
+        fields = {'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close',
+                  'Volume': 'volume', 'Dividends': 'dividends'}
+        frames = []
+        chunks = [symbols[i:i + self.download_chunk] for i in range(0, len(symbols), self.download_chunk)]
+        def download(chunk):
+            data = self.market_api.download(chunk, auto_adjust=False, actions=True, group_by='column',
+                                            threads=True, progress=False, **kwargs)
+            # yf.download swallows per-ticker errors; an empty full-period batch means we were refused
+            if (data is None or data.empty) and 'period' in kwargs:
+                raise FetchFailed(f"empty batch of {len(chunk)} symbols")
+            return data
+
+        for chunk in chunks:
+            try:
+                data = self.limiter.call(f"download:{chunk[0]}+{len(chunk) - 1}", download, chunk)
+            except FetchFailed as e:
+                logger.warning(f"Batch download failed for {len(chunk)} symbols: {e.__cause__}")
+                for s in chunk:
+                    self.limiter.record_failure(s, 'no_prices', 'batch download failed')
+                continue
+            if data is None or data.empty: continue
+
+            parts = []
+            for field, col in fields.items():
+                if field not in data: continue
+                wide = data[field]
+                if isinstance(wide, pd.Series): wide = wide.to_frame(chunk[0])
+                wide.index = pd.to_datetime(wide.index).strftime('%Y-%m-%d')
+                parts.append(wide.rename_axis('date').rename_axis('symbol', axis=1).stack().rename(col))
+            long = pd.concat(parts, axis=1).reset_index()
+            long = long.dropna(subset=['close'])
+            if 'period' in kwargs:
+                for s in set(chunk) - set(long['symbol']):
+                    self.limiter.record_failure(s, 'no_prices', 'no rows returned (delisted or throttled)')
+            frames.append(long)
+
+        if not frames: return pd.DataFrame(columns=['symbol', 'date', *fields.values()])
+        out = pd.concat(frames, ignore_index=True)
+        if 'dividends' not in out: out['dividends'] = 0.0
+        out['dividends'] = out['dividends'].fillna(0.0)
+        return out
+
+    def _first_unfinished_date(self):
+        """Bars on or after this date are still trading (or unsettled) and must not be persisted."""
+        now = datetime.now(ZoneInfo('America/New_York'))
+        today = now.date()
+        return (today if now.time() < self.session_settled else today + timedelta(days=1)).isoformat()
+
+    def _store_bars(self, frame):
+        """Persists completed sessions; today's partial bar is kept in memory for this run only."""
+        if frame.empty: return
+        unfinished = frame['date'] >= self._first_unfinished_date()
+        self.price_store.upsert(frame[~unfinished])
+        if unfinished.any():
+            self.live_bars = pd.concat([self.live_bars, frame[unfinished]], ignore_index=True)
+
+    def load_prices(self, symbols):
+        """Returns (closes, dividends) for the history window, including this run's partial bars."""
+        since = (date.today() - timedelta(days=self.history_days)).isoformat()
+        closes, dividends = self.price_store.load(symbols, since)
+        live = self.live_bars[self.live_bars['symbol'].isin(set(symbols))] if not self.live_bars.empty else self.live_bars
+        if live.empty: return closes, dividends
+        live = live.assign(date=pd.to_datetime(live['date']))
+        closes = live.pivot(index='date', columns='symbol', values='close').combine_first(closes)
+        dividends = live.pivot(index='date', columns='symbol', values='dividends').combine_first(dividends)
+        return closes, dividends.reindex_like(closes).fillna(0.0)
+
+    def refresh_price_store(self, symbols):
+        """
+        Tops up the local history: only days after each ticker's last stored date are downloaded.
+        The store only holds completed sessions, so the overlap-day split check compares final closes.
+        """
+        self.live_bars = pd.DataFrame()
+        cutoff = (date.today() - timedelta(days=self.history_days)).isoformat()
+        last = self.price_store.last_closes()
+
+        # Tickers sharing a last stored date share one batched request starting on that date;
+        # the overlapping day is re-fetched to detect split re-bases.
+        groups = defaultdict(list)
+        for s in symbols:
+            last_date = last.get(s, (None, None))[0]
+            groups[last_date if last_date and last_date >= cutoff else None].append(s)
+
+        rebased = []
+        for start, group in tqdm(sorted(groups.items(), key=lambda g: g[0] or ''), desc="Price history"):
+            if start is None:
+                self.price_store.delete(group)
+                self._store_bars(self.download_ohlc(group, period="1y"))
+                continue
+            fresh = self.download_ohlc(group, start=start)
+            overlap = fresh[fresh['date'] == start]
+            for sym, close in zip(overlap['symbol'], overlap['close']):
+                old_close = last[sym][1]
+                if old_close and abs(close / old_close - 1) > self.rebase_tolerance:
+                    rebased.append(sym)
+            self._store_bars(fresh[~fresh['symbol'].isin(rebased)])
+
+        if rebased:
+            logger.info(f"Re-downloading full history for {len(rebased)} re-based tickers")
+            self.price_store.delete(rebased)
+            self._store_bars(self.download_ohlc(rebased, period="1y"))
+        self.price_store.prune((date.today() - timedelta(days=self.history_days + 30)).isoformat())
+
+    def compute_price_metrics(self, closes, dividends=None):
+        """
+        Vectorized price, annualized return/volatility and Sharpe for every column of a close matrix.
+        With a matching dividends matrix, returns are total returns (close + dividend paid that day).
+        """
+        if closes.empty:
+            return pd.DataFrame(columns=['Price', 'Sharpe Ratio'])
+        prices = closes.to_numpy(dtype=float)
+        returns = self._total_returns(prices, dividends)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ann_return = np.nanmean(returns, axis=0) * 252
+            ann_vol = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(252)
+            sharpe = np.where(ann_vol > 0, (ann_return - self.rf_rate) / ann_vol, -1.0)
+
+        observations = np.sum(~np.isnan(prices), axis=0)
+        last_price = closes.ffill().iloc[-1].to_numpy(dtype=float)
+        metrics = pd.DataFrame({'Price': last_price, 'Sharpe Ratio': sharpe}, index=closes.columns)
+        return metrics[(observations >= self.min_history) & np.isfinite(metrics['Sharpe Ratio'])]
+
+    @staticmethod
+    def _total_returns(prices, dividends=None):
+        paid = np.zeros_like(prices) if dividends is None else dividends.to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (prices[1:] + paid[1:]) / prices[:-1] - 1
+
+    def compute_risk_factors(self, closes, dividends=None):
+        """Vectorized Sortino ratio, max drawdown and volatility per column of a close matrix."""
+        if closes.empty:
+            return pd.DataFrame(columns=['Sortino Ratio', 'Max Drawdown (%)', 'Volatility (%)'])
+        returns = self._total_returns(closes.to_numpy(dtype=float), dividends)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ann_return = np.nanmean(returns, axis=0) * 252
+            ann_vol = np.nanstd(returns, axis=0, ddof=1) * np.sqrt(252)
+            downside = np.sqrt(np.nanmean(np.minimum(returns, 0) ** 2, axis=0)) * np.sqrt(252)
+            sortino = np.where(downside > 0, (ann_return - self.rf_rate) / downside, np.nan)
+            wealth = np.cumprod(1 + np.nan_to_num(returns), axis=0)
+            drawdown = (wealth / np.maximum.accumulate(wealth, axis=0) - 1).min(axis=0)
+        return pd.DataFrame({'Sortino Ratio': sortino, 'Max Drawdown (%)': drawdown * 100,
+                             'Volatility (%)': ann_vol * 100}, index=closes.columns)
+
+    INFO_FIELDS = ('dividendRate', 'trailingAnnualDividendRate', 'longName', 'shortName',
+                   'fiftyTwoWeekHigh', 'trailingPE', 'sector')
+
+    def fetch_fundamentals(self, symbol):
+        """
+        Fetches the .info fields the report uses for one ticker. Yahoo answers throttled requests with
+        empty or stub dicts instead of an error, so a response without dividend or name fields raises
+        Throttled: the limiter backs off on it, and the stale entry is kept rather than caching the stub.
+        """
+        info = self.market_api.Ticker(symbol).info or {}
+        fields = {k: info.get(k) for k in self.INFO_FIELDS if info.get(k) is not None}
+        if not any(k in fields for k in ('dividendRate', 'trailingAnnualDividendRate', 'longName', 'shortName')):
+            raise Throttled(f"{symbol}: .info returned no dividend or name fields")
+        return fields
+
+    def get_fundamentals(self, symbols):
+        """
+        Returns {symbol: info}, only calling .info for tickers whose stored fundamentals are
+        missing or older than fundamentals_ttl. Failed fetches fall back to the stale values.
+        """
+        stored = self.price_store.load_fundamentals(symbols)
+        now = time.time()
+        fundamentals = {s: info for s, (fetched_at, info) in stored.items() if now - fetched_at < self.fundamentals_ttl}
+        to_fetch = [s for s in symbols if s not in fundamentals]
+        logger.info(f"Fundamentals: {len(fundamentals)} cached, {len(to_fetch)} to fetch.")
+
+        fetched, stale_used = {}, 0
+        # The pool is sized for the limiter's ceiling; the limiter decides how many actually run
+        with ThreadPoolExecutor(max_workers=self.limiter.max_concurrency) as executor:
+            future_to_symbol = {executor.submit(self.limiter.call, s, self.fetch_fundamentals, s): s for s in to_fetch}
+            for future in tqdm(as_completed(future_to_symbol), total=len(future_to_symbol), desc="Fundamentals"):
+                symbol = future_to_symbol[future]
+                try:
+                    fetched[symbol] = future.result()
+                except FetchFailed:
+                    if symbol in stored:
+                        fundamentals[symbol] = stored[symbol][1]
+                        self.limiter.note_fallback(symbol, 'stale fundamentals')
+                        stale_used += 1
+
+        self.price_store.save_fundamentals(fetched)
+        if stale_used: logger.warning(f"Using stale fundamentals for {stale_used} tickers after failed fetches.")
+        fundamentals.update(fetched)
+        return fundamentals
+
+    def build_row(self, symbol, price, sharpe, info):
+        """Applies the yield filter and builds a report row from price metrics and fundamentals."""
+        active_rate = info.get('dividendRate') or info.get('trailingAnnualDividendRate') or 0
+        div_yield_pct = (active_rate / price) * 100
+        forward, trailing = info.get('dividendRate'), info.get('trailingAnnualDividendRate')
+        div_growth_pct = (forward / trailing - 1) * 100 if forward and trailing else 0.0
+
+        if div_yield_pct > 25 or div_yield_pct < 1.0: # Filter yields < 1%
             return None
 
+        return {
+            'Symbol': symbol,
+            'Name': info.get('longName', info.get('shortName', 'N/A')),
+            'Price': price,
+            'Div Yield (%)': round(float(div_yield_pct), 2),
+            'Sharpe Ratio': round(float(sharpe), 2),
+            'Div Growth (%)': round(float(div_growth_pct), 2),
+            '52W High': info.get('fiftyTwoWeekHigh', 0),
+            'P/E Ratio': info.get('trailingPE', 'N/A'),
+            'Index': self.symbol_index_map.get(symbol, 'N/A'),
+            'Sector': info.get('sector', 'N/A')
+        }
+
     def collect_market_data(self, symbols):
         """Orchestrates data collection with 4-hour caching."""
         cache_exists = os.path.exists(self.data_cache_path)
@@ -149,13 +909,20 @@ class NyseTrendingReport:
                 except Exception: pass
 
         logger.info(f"Analyzing {len(symbols)} symbols via yfinance...")
+        self.refresh_price_store(symbols)
+        metrics = self.compute_price_metrics(*self.load_prices(symbols))
+        # Skip unreliable or negative Sharpe ratios before the expensive .info calls
+        candidates = metrics[metrics['Sharpe Ratio'] > 0]
+        logger.info(f"{len(candidates)}/{len(symbols)} symbols have a positive Sharpe ratio. Fetching fundamentals...")
+
+        fundamentals = self.get_fundamentals(list(candidates.index))
         results = []
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            future_to_symbol = {executor.submit(self.fetch_single_ticker, s): s for s in symbols}
-            for future in tqdm(as_completed(future_to_symbol), total=len(symbols), desc="Downloading"):
-                res = future.result()
-                if res: results.append(res)
+        for s, row in candidates.iterrows():
+            if s not in fundamentals: continue
+            res = self.build_row(s, row['Price'], row['Sharpe Ratio'], fundamentals[s])
+            if res: results.append(res)
 
+        self.write_failure_report()
         if results:
             df_all = pd.DataFrame(results)
             df_all.to_csv(self.data_cache_path, index=False)
@@ -168,35 +935,86 @@ class NyseTrendingReport:
         else:
             logger.error("No market data available.")
 
-    def filter_and_rank(self, top_n=100):
+    def write_failure_report(self):
+        """Writes this run's failed fetches and limiter statistics to fetch_failures.json."""
+        stats, failures, rate, limit = self.limiter.snapshot()
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'requests': stats,
+            'final_rate_per_sec': round(rate, 2),
+            'final_concurrency': int(limit),
+            'failures': dict(sorted(failures.items())),
+        }
+        with open(self.failure_report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        if failures:
+            kinds = Counter(f['kind'] for f in failures.values())
+            logger.warning(f"{len(failures)} fetch failures ({dict(kinds)}). See {self.failure_report_path}")
+
+    def filter_and_rank(self, top_n=100, section_top_n=25, strategies=None):
         """
-        Ranks stocks using a Blended Score (Sharpe Ratio * Dividend Yield).
-        Ensures a balance of price stability and strong dividend payouts.
+        Scores the cached dataset under every ranking strategy in one pass. final_report keeps the
+        Blended Score ranking (Sharpe Ratio * Dividend Yield, top_n rows); strategy_reports holds
+        the top section_top_n rows of each strategy. Risk factors come from the local price store,
+        so new strategies never need a re-download.
         """
         if self.market_data.empty: return
+        strategies = strategies or RANKING_STRATEGIES
 
-        # Calculate Blended Score
-        self.market_data['Blended Score'] = self.market_data['Sharpe Ratio'] * self.market_data['Div Yield (%)']
-        self.market_data['Blended Score'] = self.market_data['Blended Score'].round(2)
+        factors = self.market_data.set_index('Symbol')
+        risk = self.compute_risk_factors(*self.load_prices(list(factors.index)))
+        factors = factors.drop(columns=[c for c in risk.columns if c in factors]).join(risk)
+        if 'Div Growth (%)' not in factors: # Data cached before dividend growth was tracked
+            factors['Div Growth (%)'] = np.nan
+        factors['Div Growth (%)'] = factors['Div Growth (%)'].fillna(0.0)
 
-        # Sort by Blended Score descending
-        self.final_report = self.market_data.sort_values(
-            by='Blended Score',
-            ascending=False
-        ).head(top_n)
+        scores = pd.DataFrame({name: score(factors) for name, (_, score) in strategies.items()}).round(2)
+        ranked = factors.join(scores).reset_index()
+        self.market_data = ranked
+        self.strategy_reports = {
+            name: ranked.dropna(subset=[name]).sort_values(name, ascending=False).head(
+                top_n if name == 'Blended Score' else section_top_n)
+            for name in strategies
+        }
+        self.final_report = self.strategy_reports.get('Blended Score', pd.DataFrame())
 
     def generate_report(self):
-        """Generates HTML and PDF reports."""
+        """Generates HTML and PDF reports with one section per ranking strategy."""
         if self.final_report.empty:
             logger.warning("No matches for report.")
             return
 
-        output_html = 'dividend_report.html'
+        html_content, sections, current_time = self.write_html()
+        pdf_path = f"dividend_report_{current_time}.pdf"
+        self.render_pdf(html_content, sections, f"S&P Balanced Yield Report - {date.today()}", pdf_path)
+
+    def write_html(self, output_html='dividend_report.html'):
+        """Writes the HTML report; returns (html, pdf sections, timestamp) for the PDF backends."""
         pd.options.display.float_format = "{:,.2f}".format
-        cols = ['Symbol', 'Name', 'Index', 'Price', 'Div Yield (%)', 'Sharpe Ratio', 'Blended Score', 'Sector',
-                '52W High', 'P/E Ratio']
+        base_cols = ['Symbol', 'Name', 'Index', 'Price', 'Div Yield (%)', 'Sharpe Ratio']
+        tail_cols = ['Sector', '52W High', 'P/E Ratio']
+        strategy_cols = {
+            'Blended Score': ['Blended Score'],
+            'Sortino Yield': ['Sortino Ratio', 'Sortino Yield'],
+            'Drawdown-Adjusted Yield': ['Max Drawdown (%)', 'Drawdown-Adjusted Yield'],
+            'Chowder Score': ['Div Growth (%)', 'Chowder Score'],
+            'Sector-Neutral Blend': ['Blended Score', 'Sector-Neutral Blend'],
+        }
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
+        sections = []
+        html_sections = []
+        for name, table in self.strategy_reports.items():
+            extra = [c for c in strategy_cols.get(name, [name]) if c in table]
+            cols = base_cols + [c for c in extra if c not in base_cols] + tail_cols
+            description = RANKING_STRATEGIES.get(name, (name, None))[0]
+            sections.append((f"Ranked by {name}", table[cols]))
+            html_sections.append(f"""
+                <h3 id="{self._sanitize_anchor(name)}">{name} <span class="count">top {len(table)}</span></h3>
+                <p>Ranked by <strong>{name}</strong>: {description}.</p>
+                {table[cols].to_html(index=False, border=0)}""")
+        nav = " &middot; ".join(f'<a href="#{self._sanitize_anchor(n)}">{n}</a>' for n in self.strategy_reports)
+
         html_content = f"""
         <html>
         <head>
@@ -205,6 +1023,8 @@ class NyseTrendingReport:
                 body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; padding: 30px; color: #333; background-color: #f4f7f6; }}
                 .container {{ background: white; padding: 20px; border-radius: 8px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
                 h2 {{ color: #2c3e50; margin-top: 0; border-bottom: 2px solid #3498db; padding-bottom: 10px; }}
+                h3 {{ color: #2c3e50; margin-top: 40px; }}
+                h3 .count {{ font-size: 12px; color: #7f8c8d; font-weight: normal; }}
                 table {{ border-collapse: collapse; width: 100%; margin-top: 20px; font-size: 14px; }}
                 th, td {{ padding: 12px 15px; border-bottom: 1px solid #ddd; text-align: left; }}
                 th {{ background: #34495e; color: white; }}
@@ -216,8 +1036,8 @@ class NyseTrendingReport:
         <body>
             <div class="container">
                 <h2>S&P Balanced Yield Report — {date.today()}</h2>
-                <p>Filter Criteria: Ranked by <strong>Blended Score</strong> (Sharpe Ratio &times; Dividend Yield) with baseline <strong>Yield &gt; 1%</strong>.</p>
-                {self.final_report[cols].to_html(index=False, border=0)}
+                <p>Filter Criteria: baseline <strong>Yield &gt; 1%</strong>. Strategies: {nav}</p>
+                {"".join(html_sections)}
                 <div class="footer">Data sourced via yfinance for S&P 500/400/600. Generated at {current_time}.</div>
             </div>
         </body>
@@ -225,25 +1045,95 @@ class NyseTrendingReport:
         """
 
         with open(output_html, 'w', encoding='utf-8') as f: f.write(html_content)
+        return html_content, sections, current_time
 
+    @staticmethod
+    def _sanitize_anchor(name):
+        return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+    def _get_pdf_renderer(self):
+        if self._pdf_renderer is None:
+            choice = self.pdf_backend
+            if choice == 'auto':
+                choice = 'matplotlib' if plt is not None and not self.keep_browser else 'chromium'
+            if choice == 'matplotlib' and plt is None:
+                logger.warning("matplotlib is not installed; using the Chromium PDF backend.")
+                choice = 'chromium'
+            self._pdf_renderer = MatplotlibPdfBackend() if choice == 'matplotlib' else ChromiumPdfBackend()
+        return self._pdf_renderer
+
+    def render_pdf(self, html, sections, title, pdf_path):
+        """Writes the PDF with the selected backend; in auto mode a failed Chromium falls back to matplotlib."""
+        renderer = self._get_pdf_renderer()
+        start = time.perf_counter()
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch()
-                page = browser.new_page()
-                page.set_content(html_content)
-                pdf_path = f"dividend_report_{current_time}.pdf"
-                page.pdf(path=pdf_path, format='A4', landscape=True, print_background=True)
-                browser.close()
-            logger.info(f"PDF Report saved: {pdf_path}")
+            renderer.render(html, sections, title, pdf_path)
         except Exception as e:
-            logger.error(f"PDF error: {e}")
+            if self.pdf_backend != 'auto' or renderer.name != 'chromium' or plt is None:
+                logger.error(f"PDF error: {e}")
+                return
+            logger.warning(f"Chromium PDF export failed ({e}); falling back to matplotlib.")
+            self.close()
+            self._pdf_renderer = renderer = MatplotlibPdfBackend()
+            renderer.render(html, sections, title, pdf_path)
+        logger.info(f"PDF Report saved: {pdf_path} ({renderer.name}, {time.perf_counter() - start:.2f}s)")
 
-    def run(self):
+    def close(self):
+        """Releases the PDF backend (shuts down a kept-open browser)."""
+        if self._pdf_renderer is not None:
+            self._pdf_renderer.close()
+            self._pdf_renderer = None
+
+    def _publish_stream(self, ranker):
+        self.final_report = ranker.report_frame()
+        self.strategy_reports = {'Blended Score': self.final_report}
+        self.write_html()
+
+    def run_stream(self, poll_seconds=60, top_n=25, slice_size=50, cycles=None, source=None):
+        """
+        Long-running mode: builds the ranked universe once, then polls recent bars and rewrites
+        dividend_report.html whenever the Blended Score top-N changes.
+        """
         symbols = self.get_all_symbols_with_indices()
-        if symbols:
+        try:
+            if not symbols: return
             self.collect_market_data(symbols)
             self.filter_and_rank()
-            self.generate_report()
+            if self.market_data.empty: return
+            universe = self.market_data.dropna(subset=['Price', 'Div Yield (%)'])
+            since = (date.today() - timedelta(days=self.history_days)).isoformat()
+            closes, dividends = self.price_store.load(list(universe['Symbol']), since)
+            ranker = StreamingRanker(universe, closes, dividends, source or YFinanceBarSource(self),
+                                     on_change=self._publish_stream, top_n=top_n, slice_size=slice_size,
+                                     rf_rate=self.rf_rate)
+            logger.info(f"Streaming {len(ranker.symbols)} tickers: top {top_n} + {slice_size} rotating per poll")
+            ranker.run(poll_seconds=poll_seconds, cycles=cycles)
+        finally:
+            self.close()
+
+    def run(self):
+        symbols = self.get_all_symbols_with_indices()
+        try:
+            if symbols:
+                self.collect_market_data(symbols)
+                self.filter_and_rank()
+                self.generate_report()
+        finally:
+            self.close()
 
 if __name__ == "__main__":
-    NyseTrendingReport().run()
+    parser = argparse.ArgumentParser(description='S&P dividend report ranked by Sharpe ratio and yield')
+    parser.add_argument('--pdf-backend', choices=['auto', 'chromium', 'matplotlib'], default='auto',
+                        help='PDF renderer (auto: matplotlib for one-off reports when installed)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Keep running and refresh the HTML report from recent bars whenever the ranking changes')
+    parser.add_argument('--poll-seconds', type=int, default=60, help='Stream mode: seconds between polls')
+    parser.add_argument('--stream-top-n', type=int, default=25, help='Stream mode: tickers polled every cycle')
+    parser.add_argument('--stream-slice', type=int, default=50,
+                        help='Stream mode: other tickers polled per cycle, in rotation')
+    args = parser.parse_args()
+    report = NyseTrendingReport(pdf_backend=args.pdf_backend)
+    if args.stream:
+        report.run_stream(poll_seconds=args.poll_seconds, top_n=args.stream_top_n, slice_size=args.stream_slice)
+    else:
+        report.run()
@@ -0,0 +1,410 @@
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import contextlib
+from pathlib import Path
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+import nyse_trending_report as ntr
+
+
+FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends']
+INDEX_URLS = {
+    'S&P 500': 'https://en.wikipedia.org/wiki/List_of_S%26P_500_companies',
+    'S&P 400': 'https://en.wikipedia.org/wiki/List_of_S%26P_400_companies',
+    'S&P 600': 'https://en.wikipedia.org/wiki/List_of_S%26P_600_companies',
+}
+
+
+class RecordingMarketAPI:
+    """Passes download()/Ticker().info through to yfinance and keeps every response for replay."""
+
+    def __init__(self, api=yf):
+        self.api = api
+        self.prices = {}
+        self.info = {}
+        self.lock = threading.Lock()
+
+    def download(self, tickers, **kwargs):
+        data = self.api.download(tickers, **kwargs)
+        if data is None or data.empty:
+            return data
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        with self.lock:
+            for t in tickers:
+                cols = {f: data[f][t] for f in FIELDS if f in data and t in data[f]}
+                if 'Close' not in cols:
+                    continue
+                frame = pd.DataFrame(cols).dropna(subset=['Close'])
+                old = self.prices.get(t)
+                self.prices[t] = frame if old is None else frame.combine_first(old)
+        return data
+
+    def Ticker(self, symbol):
+        recorder = self
+
+        class _Ticker:
+            @property
+            def info(self):
+                info = recorder.api.Ticker(symbol).info
+                with recorder.lock:
+                    recorder.info[symbol] = {k: v for k, v in (info or {}).items()
+                                             if isinstance(v, (str, int, float, bool)) or v is None}
+                return info
+        return _Ticker()
+
+    def save(self, fixture_dir, pages):
+        fixture_dir = Path(fixture_dir)
+        (fixture_dir / 'pages').mkdir(parents=True, exist_ok=True)
+        prices = pd.concat({t: f for t, f in self.prices.items()}, names=['symbol', 'date']).reset_index()
+        prices.to_pickle(fixture_dir / 'prices.pkl')
+        with open(fixture_dir / 'info.json', 'w', encoding='utf-8') as f:
+            json.dump(self.info, f)
+        index = {}
+        for url, body in pages.items():
+            name = hashlib.sha1(url.encode()).hexdigest()[:12] + '.html'
+            (fixture_dir / 'pages' / name).write_bytes(body)
+            index[url] = name
+        with open(fixture_dir / 'pages' / 'index.json', 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+
+
+class RecordingSession:
+    """requests.Session stand-in that records page bodies by URL."""
+
+    def __init__(self, session):
+        self.session = session
+        self.headers = session.headers
+        self.pages = {}
+
+    def get(self, url, **kwargs):
+        resp = self.session.get(url, **kwargs)
+        if resp.status_code == 200:
+            self.pages[url] = resp.content
+        return resp
+
+
+class ReplayResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise ntr.requests.exceptions.HTTPError(f"{self.status_code} replay error", response=self)
+
+
+class ReplaySession:
+    """Serves fixed pages by URL with ETags, answering 304 to a matching If-None-Match."""
+
+    def __init__(self, pages, latency_ms=0.0):
+        self.pages = pages
+        self.latency_ms = latency_ms
+        self.headers = {}
+        self.requests = Counter()
+
+    def get(self, url, timeout=None, headers=None):
+        time.sleep(self.latency_ms / 1000)
+        body = self.pages.get(url)
+        if body is None:
+            self.requests['404'] += 1
+            return ReplayResponse(404)
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if (headers or {}).get('If-None-Match') == etag:
+            self.requests['304'] += 1
+            return ReplayResponse(304)
+        self.requests['200'] += 1
+        return ReplayResponse(200, body, {'ETag': etag})
+
+
+class ReplayMarketAPI:
+    """
+    yfinance stand-in serving fixture data. Any ticker name is accepted: it is mapped onto one of
+    the fixture's template series (scaled by a per-name factor) so the universe can be any size.
+    Template histories are re-dated onto the business days ending today. Each call sleeps
+    latency_ms plus per_ticker_ms per requested ticker; throttle_rate of calls raise a 429-style
+    error and error_rate of tickers come back missing (download) or as an empty .info dict.
+    """
+
+    def __init__(self, templates, infos, latency_ms=50.0, per_ticker_ms=0.5, error_rate=0.0,
+                 throttle_rate=0.0, seed=0):
+        self.templates = templates
+        self.infos = infos
+        self.latency_ms, self.per_ticker_ms = latency_ms, per_ticker_ms
+        self.error_rate, self.throttle_rate = error_rate, throttle_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = Counter()
+
+        days = max(len(t) for t in templates)
+        self.dates = pd.bdate_range(end=pd.Timestamp.today().normalize() - pd.offsets.BDay(1), periods=days)
+
+    def _template(self, symbol):
+        h = int(hashlib.md5(symbol.encode()).hexdigest(), 16)
+        return self.templates[h % len(self.templates)], self.infos[h % len(self.infos)], 0.5 + (h >> 8) % 1000 / 500
+
+    def _roll(self, kind, n_tickers=1):
+        with self.lock:
+            self.calls[kind] += 1
+            throttled = self.rng.random() < self.throttle_rate
+            dropped = [self.rng.random() < self.error_rate for _ in range(n_tickers)]
+        time.sleep((self.latency_ms + self.per_ticker_ms * n_tickers) / 1000)
+        if throttled:
+            with self.lock:
+                self.calls['throttled'] += 1
+            raise Exception("429 Client Error: Too Many Requests (replay)")
+        return dropped
+
+    def download(self, tickers, period=None, start=None, **kwargs):
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        dropped = self._roll('download', len(tickers))
+        dates = self.dates
+        if start is not None:
+            dates = dates[dates >= pd.Timestamp(start)]
+        elif period is not None and period.endswith('d'):
+            dates = dates[-int(period[:-1]):]
+        columns = {}
+        for t, drop in zip(tickers, dropped):
+            if drop:
+                continue
+            template, _, scale = self._template(t)
+            values = template[-len(dates):] if len(dates) else template[:0]
+            for i, field in enumerate(FIELDS):
+                column = np.full(len(dates), np.nan)
+                column[len(dates) - len(values):] = values[:, i] * (1 if field == 'Volume' else scale)
+                columns[(field, t)] = column
+        if not columns:
+            return pd.DataFrame()
+        return pd.DataFrame(columns, index=dates)
+
+    def Ticker(self, symbol):
+        api = self
+
+        class _Ticker:
+            @property
+            def info(self):
+                if api._roll('info')[0]:
+                    return {}
+                _, info, scale = api._template(symbol)
+                info = dict(info)
+                for k in ('dividendRate', 'trailingAnnualDividendRate', 'fiftyTwoWeekHigh'):
+                    if info.get(k):
+                        info[k] *= scale
+                info['shortName'] = info['longName'] = f"{symbol} Holdings"
+                return info
+        return _Ticker()
+
+
+def synthetic_templates(count=64, days=300, seed=0):
+    """Random-walk OHLCV + quarterly dividend series with matching .info dicts."""
+    rng = np.random.default_rng(seed)
+    sectors = ['Utilities', 'Financials', 'Energy', 'Industrials', 'Consumer Staples', 'Real Estate', 'Health Care']
+    templates, infos = [], []
+    for i in range(count):
+        close = rng.uniform(20, 200) * np.cumprod(1 + rng.normal(rng.uniform(-0.0005, 0.001),
+                                                                 rng.uniform(0.008, 0.03), days))
+        high, low = close * (1 + rng.uniform(0, 0.02, days)), close * (1 - rng.uniform(0, 0.02, days))
+        dividend_yield = rng.uniform(0, 0.07)
+        dividends = np.zeros(days)
+        dividends[rng.integers(0, 63)::63] = close[-1] * dividend_yield / 4
+        templates.append(np.column_stack([close, high, low, close, rng.integers(1e5, 1e7, days), dividends]))
+        rate = close[-1] * dividend_yield
+        infos.append({'dividendRate': rate, 'trailingAnnualDividendRate': rate * rng.uniform(0.85, 1.05),
+                      'fiftyTwoWeekHigh': float(high.max()), 'trailingPE': float(rng.uniform(8, 40)),
+                      'sector': sectors[i % len(sectors)]})
+    return templates, infos
+
+
+def load_fixture(fixture_dir):
+    """Templates and infos from a recorded fixture directory, or None when there is none."""
+    fixture_dir = Path(fixture_dir)
+    if not (fixture_dir / 'prices.pkl').exists():
+        return None
+    prices = pd.read_pickle(fixture_dir / 'prices.pkl')
+    with open(fixture_dir / 'info.json', 'r', encoding='utf-8') as f:
+        info = json.load(f)
+    templates, infos = [], []
+    for symbol, frame in prices.groupby('symbol'):
+        frame = frame.sort_values('date')
+        if symbol not in info or len(frame) < 60:
+            continue
+        templates.append(frame[FIELDS].fillna(0.0).to_numpy(dtype=float))
+        infos.append(info[symbol])
+    return (templates, infos) if templates else None
+
+
+def index_pages(symbols):
+    """Wikipedia-like constituent pages for the three indices, splitting symbols between them."""
+    pages = {}
+    for k, (name, url) in enumerate(INDEX_URLS.items()):
+        rows = "".join(f'<tr><td><a href="/q/{s}">{s}</a></td><td>{s} Holdings</td><td>Sector</td></tr>'
+                       for s in symbols[k::3])
+        pages[url] = (f'<html><body><h1>{name}</h1><table class="wikitable sortable" id="constituents">'
+                      f'<tbody><tr><th>Symbol</th><th>Security</th><th>GICS Sector</th></tr>{rows}'
+                      f'</tbody></table></body></html>').encode()
+    return pages
+
+
+class TimedReport(ntr.NyseTrendingReport):
+    """NyseTrendingReport that accumulates wall time per pipeline stage."""
+
+    STAGES = {
+        'get_all_symbols_with_indices': 'symbols',
+        'refresh_price_store': 'prices',
+        'get_fundamentals': 'fundamentals',
+        'compute_price_metrics': 'metrics',
+        'filter_and_rank': 'metrics',
+        'generate_report': 'render',
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stage_times = Counter()
+        for method, stage in self.STAGES.items():
+            setattr(self, method, self._timed(getattr(self, method), stage))
+
+    def _timed(self, fn, stage):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.stage_times[stage] += time.perf_counter() - start
+        return wrapper
+
+
+class ReportBenchmark:
+    """
+    Runs the full NyseTrendingReport pipeline offline against ReplayMarketAPI/ReplaySession at
+    several universe sizes. Each size gets a fresh working directory and is run twice: cold (empty
+    stores) and warm (price top-up, cached fundamentals, 304 constituent pages), with per-stage time.
+    """
+
+    def __init__(self, fixture_dir='nyse_fixtures', out_dir='nyse_bench_output', sizes=(500, 1500, 5000),
+                 latency_ms=50.0, per_ticker_ms=0.5, error_rate=0.0, throttle_rate=0.0, page_latency_ms=100.0,
+                 production_limits=False, seed=0):
+        self.out_dir = Path(out_dir)
+        self.sizes = sizes
+        self.replay_options = dict(latency_ms=latency_ms, per_ticker_ms=per_ticker_ms, error_rate=error_rate,
+                                   throttle_rate=throttle_rate, seed=seed)
+        self.page_latency_ms = page_latency_ms
+        self.production_limits = production_limits
+        fixture = load_fixture(fixture_dir)
+        self.fixture_source = str(fixture_dir) if fixture else 'synthetic'
+        self.templates, self.infos = fixture or synthetic_templates(seed=seed)
+
+    def _run_once(self, workdir, symbols, pages):
+        api = ReplayMarketAPI(self.templates, self.infos, **self.replay_options)
+        report = TimedReport(cache_path=workdir / 'market_symbols.csv', data_cache_path=workdir / 'market_data.csv',
+                             history_db=workdir / 'market_history.sqlite', pdf_backend='matplotlib', market_api=api)
+        report.session = ReplaySession(pages, self.page_latency_ms)
+        if not self.production_limits:
+            # The replay backend is the bottleneck being measured, not Yahoo's real limits
+            report.limiter = ntr.AdaptiveRateLimiter(rate=500, max_rate=2000, concurrency=16, max_concurrency=32,
+                                                     backoff_base=0.05)
+        start = time.perf_counter()
+        with contextlib.chdir(workdir):
+            report.run()
+        wall = time.perf_counter() - start
+        stats, failures, _, _ = report.limiter.snapshot()
+        return {
+            'wall_seconds': round(wall, 3),
+            'stage_seconds': {k: round(v, 3) for k, v in sorted(report.stage_times.items())},
+            'api_calls': dict(api.calls),
+            'page_requests': dict(report.session.requests),
+            'limiter': stats,
+            'failures': len(failures),
+            'ranked': len(report.final_report),
+        }
+
+    def run(self):
+        results = []
+        for n in self.sizes:
+            symbols = [f"B{i:04d}" for i in range(n)]
+            pages = index_pages(symbols)
+            with tempfile.TemporaryDirectory(prefix='nyse_bench_') as tmp:
+                workdir = Path(tmp)
+                cold = self._run_once(workdir, symbols, pages)
+                # Warm pass: drop the 4-hour report cache and the weekly symbol CSV so every stage runs again
+                for name in ('market_data.csv', 'market_symbols.csv'):
+                    (workdir / name).unlink(missing_ok=True)
+                warm = self._run_once(workdir, symbols, pages)
+            results.append({'tickers': n, 'cold': cold, 'warm': warm})
+            print(f"{n:>6} tickers  cold {cold['wall_seconds']:>8.2f}s  warm {warm['wall_seconds']:>8.2f}s")
+        return self._report(results)
+
+    def _report(self, results):
+        summary = {
+            'fixture': self.fixture_source,
+            'templates': len(self.templates),
+            'replay': self.replay_options,
+            'page_latency_ms': self.page_latency_ms,
+            'production_limits': self.production_limits,
+            'runs': results,
+        }
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.out_dir / 'bench_report.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+        rows = [{'tickers': r['tickers'], 'pass': p, 'stage': stage, 'seconds': seconds}
+                for r in results for p in ('cold', 'warm') for stage, seconds in r[p]['stage_seconds'].items()]
+        table = pd.DataFrame(rows).pivot_table(index=['tickers', 'pass'], columns='stage', values='seconds')
+        table.to_csv(self.out_dir / 'stage_times.csv')
+        print("\nStage time (seconds):")
+        print(table.round(2).to_string())
+        print(f"\nReport saved to {self.out_dir}")
+        return summary
+
+
+def record_fixture(fixture_dir, sample=150, seed=0):
+    """Runs the real symbol scrape and data collection for a sample of tickers, saving every response."""
+    recorder = RecordingMarketAPI()
+    with tempfile.TemporaryDirectory(prefix='nyse_record_') as tmp:
+        workdir = Path(tmp)
+        report = ntr.NyseTrendingReport(cache_path=workdir / 'symbols.csv', data_cache_path=workdir / 'data.csv',
+                                        history_db=workdir / 'history.sqlite', market_api=recorder)
+        report.session = RecordingSession(report.session)
+        symbols = report.get_all_symbols_with_indices()
+        sample = random.Random(seed).sample(symbols, min(sample, len(symbols)))
+        # Record .info for every sampled ticker, not just the Sharpe-positive ones
+        report.refresh_price_store(sample)
+        report.get_fundamentals(sample)
+        recorder.save(fixture_dir, report.session.pages)
+    print(f"Recorded {len(recorder.prices)} price histories, {len(recorder.info)} info dicts and "
+          f"{len(report.session.pages)} pages to {fixture_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Offline replay benchmark for nyse_trending_report.py')
+    parser.add_argument('--fixtures', default='nyse_fixtures', help='Recorded fixture directory (synthetic if absent)')
+    parser.add_argument('--record', type=int, metavar='N', default=0,
+                        help='Record a fixture from live Yahoo/Wikipedia for N sampled tickers, then exit')
+    parser.add_argument('-o', '--out', default='nyse_bench_output', help='Directory for the benchmark report')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 1500, 5000], help='Universe sizes to run')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Replay latency per API call')
+    parser.add_argument('--per-ticker-ms', type=float, default=0.5, help='Extra replay latency per requested ticker')
+    parser.add_argument('--page-latency-ms', type=float, default=100.0, help='Replay latency per Wikipedia request')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of tickers returned missing/empty')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of calls failing with a 429')
+    parser.add_argument('--production-limits', action='store_true',
+                        help="Keep the report's default rate limiter instead of an unthrottled one")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixture(args.fixtures, sample=args.record, seed=args.seed)
+    else:
+        ReportBenchmark(
+            args.fixtures, out_dir=args.out, sizes=args.sizes, latency_ms=args.latency_ms,
+            per_ticker_ms=args.per_ticker_ms, error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+            page_latency_ms=args.page_latency_ms, production_limits=args.production_limits, seed=args.seed,
+        ).run()
@@ -12,3 +12,71 @@ spec.loader.exec_module(module)
 
 def test_imports():
     assert module is not None
+
+def _stream_fixture(n_symbols=6, days=80, seed=1):
+    import numpy as np, pandas as pd
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2026-01-02', periods=days)
+    symbols = [f"T{i}" for i in range(n_symbols)]
+    closes = pd.DataFrame(50 * np.cumprod(1 + rng.normal(0.001, 0.02, (days, n_symbols)), axis=0),
+                          index=dates, columns=symbols)
+    dividends = pd.DataFrame(0.0, index=dates, columns=symbols)
+    universe = pd.DataFrame({'Symbol': symbols, 'Name': symbols, 'Price': closes.iloc[-1].values,
+                             'Div Yield (%)': rng.uniform(2, 6, n_symbols)})
+    return universe, closes, dividends
+
+def test_streaming_ranker_matches_batch_sharpe():
+    import numpy as np, pandas as pd
+    universe, closes, dividends = _stream_fixture()
+    window = 40
+    source = module.StubBarSource(closes.iloc[-1], closes.index[-1], seed=3)
+    ranker = module.StreamingRanker(universe, closes, dividends, source, top_n=3, slice_size=2, window=window)
+    history = closes.copy()
+    for _ in range(15):
+        source.next_session()
+        for _ in range(3): # Intraday polls revise the provisional bar
+            bars = source.latest_bars(ranker.symbols)
+            ranker.apply_bars(bars)
+        history.loc[source.session] = bars.set_index('symbol')['close']
+
+    returns = history.pct_change().iloc[1:].tail(window + 1) # Committed window plus the provisional day
+    expected = (returns.mean() * 252 - ranker.rf_rate) / (returns.std() * np.sqrt(252))
+    np.testing.assert_allclose(ranker.scores()['Sharpe Ratio'].values, expected.values, rtol=1e-9)
+
+def test_streaming_ranker_renders_only_on_ranking_change():
+    universe, closes, dividends = _stream_fixture()
+    source = module.StubBarSource(closes.iloc[-1], closes.index[-1], volatility=0.0)
+    renders = []
+    ranker = module.StreamingRanker(universe, closes, dividends, source, on_change=renders.append,
+                                    top_n=3, slice_size=2)
+    ranker.run(poll_seconds=0, cycles=4)
+    assert len(renders) == 1 # Flat quotes never change the order
+    assert list(ranker.report_frame()['Symbol']) == list(ranker.ranking)
+
+def test_streaming_ranker_starts_without_stored_history():
+    import numpy as np, pandas as pd
+    universe, closes, dividends = _stream_fixture()
+    source = module.StubBarSource(closes.iloc[-1], closes.index[-1], seed=3)
+    # Empty history DB (report served from the CSV cache) and a ticker with no stored closes at all
+    partial = closes.copy()
+    partial['T0'] = np.nan
+    for frame, divs in ((pd.DataFrame(), pd.DataFrame()), (partial, dividends)):
+        ranker = module.StreamingRanker(universe, frame, divs, source, top_n=3, slice_size=6, window=40)
+        for _ in range(3):
+            source.next_session()
+            ranker.apply_bars(source.latest_bars(ranker.symbols))
+        # Session 1 seeds the base when session 2 arrives; session 2 is the first committed return
+        assert ranker.count[ranker.col['T0']] == 1
+        assert len(ranker.scores()) == len(universe)
+
+def test_stub_info_backs_off_limiter():
+    limiter = module.AdaptiveRateLimiter(rate=8, concurrency=8, max_retries=1, backoff_base=0.0, cooldown=0.0)
+    report = module.NyseTrendingReport.__new__(module.NyseTrendingReport)
+    report.market_api = type('StubAPI', (), {'Ticker': lambda self, s: type('T', (), {'info': {'trailingPE': 12.0}})()})()
+    try:
+        limiter.call('T0', report.fetch_fundamentals, 'T0')
+    except module.FetchFailed:
+        pass
+    stats, failures, rate, limit = limiter.snapshot()
+    assert stats['throttled'] == 2 and rate == 2.0 and limit == 2.0
+    assert failures['T0']['kind'] == 'throttled'
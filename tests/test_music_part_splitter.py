@@ -12,3 +12,68 @@ spec.loader.exec_module(module)
 
 def test_imports():
     assert module is not None
+
+def test_preprocess_blank_pages():
+    from PIL import Image
+    for value in (0, 255):
+        page = Image.new('L', (850, 1100), value)
+        for crop_header in (True, False):
+            out = module._preprocess_page(page, crop_header=crop_header)
+            assert out.mode == 'L'
+            assert out.getextrema() == (255, 255)
+
+def test_preprocess_full_page_keeps_lower_text():
+    import numpy as np
+    from PIL import Image, ImageDraw
+    page = Image.new('L', (850, 1100), 255)
+    draw = ImageDraw.Draw(page)
+    draw.text((40, 20), "TRUMPET 1", fill=0)
+    for top in (100, 300):
+        for line in range(5):
+            draw.line((0, top + line * 10, 849, top + line * 10), fill=0, width=2)
+    draw.text((40, 600), "TROMBONE 2", fill=0)
+    header = np.asarray(module._preprocess_page(page))
+    full = np.asarray(module._preprocess_page(page, crop_header=False))
+    assert header.shape[0] < 100
+    assert full.shape == (1100, 850)
+    assert (full[590:620] == 0).any()
+    assert not (full[100:145] == 0).all(axis=1).any()
+
+def test_alias_matcher_matches_brute_force():
+    import re, random, difflib
+    instruments = [
+        ("Alto Sax 1", ["alto sax 1", "alto saxophone 1", "1st alto"]),
+        ("Tenor Sax 2", ["tenor sax 2", "tenor 2", "2nd tenor"]),
+        ("Trumpet 1", ["trumpet 1", "tpt 1", "trumpet in bb 1"]),
+        ("Trombone 3", ["trombone 3", "tbn. 3", "3rd trombone"]),
+        ("Bass", ["bass", "string bass", "el. bass"]),
+        ("Piano", ["piano", "pno"]),
+    ]
+    matcher = module.AliasMatcher(instruments)
+    vocab = sorted({w for _, aliases in instruments for a in aliases for w in a.split()}) + [
+        "saxophne", "trumpt", "basss", "tenr", "sax1", "arranged", "by", "-", ".", "\n"]
+
+    def brute_force(text):
+        exact = [sum(len(re.findall(r"\b" + re.escape(a) + r"\b", text)) for a in aliases)
+                 for _, aliases in instruments]
+        words = re.findall(r"[a-z0-9]+", text)
+        fuzzy = []
+        for _, aliases in instruments:
+            score = 0
+            for a in aliases:
+                n = len(re.findall(r"[a-z0-9]+", a))
+                for i in range(0, max(1, len(words) - n + 1)):
+                    if difflib.SequenceMatcher(None, " ".join(words[i:i + n]), a).ratio() >= 0.88:
+                        score += 1
+            fuzzy.append(score)
+        return exact, fuzzy
+
+    rng = random.Random(0)
+    for _ in range(1000):
+        text = " ".join(rng.choice(vocab) for _ in range(rng.randint(0, 12)))
+        if rng.random() < 0.3:
+            text = text.replace(" ", "")
+        assert (matcher.exact_scores(text), matcher.fuzzy_scores(text)) == brute_force(text), text
+
+    matcher.add("Piano", "keys")
+    assert matcher.exact_scores("keys solo")[matcher.names.index("Piano")] == 1
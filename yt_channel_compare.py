@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
-import os, re, json, time, yaml, logging, argparse, concurrent.futures, requests
+import os, re, json, time, yaml, sqlite3, hashlib, logging, argparse, threading, concurrent.futures, requests
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import datetime as dt
 from pathlib import Path
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 
 # Configure logging: Set root level to WARNING to silence chatty libraries
 logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,17 +14,186 @@ logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s -
 logger = logging.getLogger('yt_compare')
 logger.setLevel(logging.INFO)
 
+# Channel pages embed their state as `var ytInitialData = {...};`. raw_decode parses that object once
+# and stops at its closing brace; the regexes are only a fallback when the blob is missing or moved.
+INITIAL_DATA_RE = re.compile(r'(?:var ytInitialData|window\["ytInitialData"\])\s*=\s*')
+ABOUT_RENDERERS = ('aboutChannelViewModel', 'channelAboutFullMetadataRenderer')
+VIDEO_RENDERERS = ('videoRenderer', 'gridVideoRenderer')
+VIEW_PATTERNS = [re.compile(p) for p in (
+    r'\"viewCountText\":\{\"simpleText\":\"(.*?)\"\}',
+    r'\"viewCountText\":\{.{0,200}?\"text\":\"(.*?)\"',
+    r'\"viewCount\":\"(\d+)\"',
+    r'viewCount\\\":\\\"(\d+)\\\"',
+    r'([0-9,]+) views',
+)]
+# Bounded gap so a title without a nearby view count cannot scan the rest of the document
+VIDEO_PATTERN = re.compile(r'\"title\":\{\"runs\":\[\{\"text\":\"(.*?)\"\}\].{0,2000}?\"viewCountText\":\{\"simpleText\":\"(.*?)\"\}', re.S)
+JSON_DECODER = json.JSONDecoder()
+
+def _initial_data(html):
+    """Returns the parsed ytInitialData object of a page, or None if it is absent or malformed."""
+    match = INITIAL_DATA_RE.search(html)
+    if not match: return None
+    try: return JSON_DECODER.raw_decode(html, match.end())[0]
+    except ValueError: return None
+
+def _find_renderers(node, names):
+    """Yields (name, value) for every key in names, in document order, without descending into matches."""
+    stack = [(None, node)]
+    while stack:
+        key, value = stack.pop()
+        if key in names: yield key, value
+        elif isinstance(value, dict): stack.extend(reversed(value.items()))
+        elif isinstance(value, list): stack.extend((None, v) for v in reversed(value))
+
+def _text(node):
+    """Flattens YouTube's text shapes: plain string, {simpleText}, {content} or {runs: [{text}]}."""
+    if isinstance(node, str): return node
+    if not isinstance(node, dict): return None
+    if 'simpleText' in node: return node['simpleText']
+    if 'content' in node: return node['content']
+    if 'runs' in node: return ''.join(r.get('text', '') for r in node['runs'])
+    return None
+
+def _parse_count(text):
+    """'1,234 views' -> 1234, '5.5K views' -> 5500; None if text is not a count."""
+    if not text: return None
+    val = text.replace(' views', '').replace(' view', '').replace(',', '').replace('\\"', '').replace('"', '').strip()
+    scale = {'K': 1e3, 'M': 1e6, 'B': 1e9}.get(val[-1:], 1)
+    try: return int(float(val.rstrip('KMB')) * scale)
+    except ValueError: return None
+
+class ChannelHistoryStore:
+    """
+    SQLite history of daily channel view totals keyed by (channel_name, date). Each run upserts
+    today's rows, and readers load only the date window they need instead of every day tracked.
+    Recent videos are normalized into `videos` (one row per video id, title stored once) and
+    `video_views` (one integer snapshot per video per day, clustered on video id).
+    """
+    COLUMNS = ['channel_name', 'date', 'day_of_week', 'total_views_today']
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS channel_stats (
+                    channel_name TEXT NOT NULL, date TEXT NOT NULL, day_of_week TEXT, total_views_today INTEGER,
+                    PRIMARY KEY (channel_name, date)
+                ) WITHOUT ROWID""")
+            conn.execute("CREATE INDEX IF NOT EXISTS channel_stats_date ON channel_stats (date)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id TEXT PRIMARY KEY, channel_name TEXT NOT NULL, title TEXT, first_seen TEXT NOT NULL
+                ) WITHOUT ROWID""")
+            conn.execute("CREATE INDEX IF NOT EXISTS videos_channel_title ON videos (channel_name, title)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS video_views (
+                    video_id TEXT NOT NULL, date TEXT NOT NULL, views INTEGER NOT NULL,
+                    PRIMARY KEY (video_id, date)
+                ) WITHOUT ROWID""")
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def upsert(self, frame):
+        if frame.empty: return
+        rows = frame[self.COLUMNS].astype(object).where(frame[self.COLUMNS].notna(), None).itertuples(index=False, name=None)
+        with self._connect() as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO channel_stats ({', '.join(self.COLUMNS)}) VALUES (?, ?, ?, ?)", rows)
+
+    def load(self, since=None):
+        """Rows with date >= since (YYYY-MM-DD), or the whole history when since is None."""
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM channel_stats"
+        with self._connect() as conn:
+            rows = conn.execute(query + " WHERE date >= ? ORDER BY date", (since,)).fetchall() if since else conn.execute(query + " ORDER BY date").fetchall()
+        return pd.DataFrame(rows, columns=self.COLUMNS)
+
+    UPSERT_VIDEO = """
+        INSERT INTO videos (video_id, channel_name, title, first_seen) VALUES (?, ?, ?, ?)
+        ON CONFLICT (video_id) DO UPDATE SET title = excluded.title, first_seen = MIN(first_seen, excluded.first_seen)"""
+
+    def _video_key(self, conn, channel_name, video):
+        """
+        The video's YouTube id when known, else the id already stored for (channel, title), else a
+        stable stand-in hashed from channel + title (legacy JSON and regex-fallback results have no id).
+        The first time a real id arrives for a title-keyed video, its row and snapshots are re-keyed.
+        """
+        title, real_id = video['title'], video.get('video_id')
+        known = [k for k, in conn.execute("SELECT video_id FROM videos WHERE channel_name = ? AND title = ?", (channel_name, title))]
+        if not real_id:
+            return next((k for k in known if not k.startswith('t_')), known[0] if known else
+                        't_' + hashlib.sha1(f"{channel_name}\0{title}".encode()).hexdigest()[:11])
+        for old in (k for k in known if k.startswith('t_')):
+            first_seen = conn.execute("SELECT first_seen FROM videos WHERE video_id = ?", (old,)).fetchone()[0]
+            conn.execute("UPDATE OR IGNORE video_views SET video_id = ? WHERE video_id = ?", (real_id, old))
+            conn.execute("DELETE FROM video_views WHERE video_id = ?", (old,))
+            conn.execute("DELETE FROM videos WHERE video_id = ?", (old,))
+            conn.execute(self.UPSERT_VIDEO, (real_id, channel_name, title, first_seen))
+        return real_id
+
+    def upsert_videos(self, date, video_logs):
+        """Stores one views snapshot per video for date; first_seen is the earliest date the video was stored."""
+        with self._connect() as conn:
+            for log in video_logs:
+                for v in log['videos']:
+                    key = self._video_key(conn, log['channel'], v)
+                    conn.execute(self.UPSERT_VIDEO, (key, log['channel'], v['title'], date))
+                    conn.execute("INSERT OR REPLACE INTO video_views (video_id, date, views) VALUES (?, ?, ?)", (key, date, int(v['views'])))
+
+    def load_video_views(self, since=None):
+        """Long frame of (video_id, channel_name, title, first_seen, date, views) snapshots with date >= since."""
+        query = """
+            SELECT s.video_id, v.channel_name, v.title, v.first_seen, s.date, s.views
+            FROM video_views s JOIN videos v ON v.video_id = s.video_id"""
+        with self._connect() as conn:
+            rows = conn.execute(query + " WHERE s.date >= ?", (since,)).fetchall() if since else conn.execute(query).fetchall()
+        return pd.DataFrame(rows, columns=['video_id', 'channel_name', 'title', 'first_seen', 'date', 'views'])
+
+    def migrate_video_json(self, json_dir):
+        """One-time import of the legacy video_trends_<date>.json dumps; later calls are no-ops."""
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'video_json_migrated'").fetchone(): return 0
+        files = sorted(Path(json_dir).glob("video_trends_*.json"))
+        for file in files:
+            try:
+                with open(file, 'r', encoding='utf-8') as f: logs = json.load(f)
+                for date in {log['date'] for log in logs}:
+                    self.upsert_videos(date, [log for log in logs if log['date'] == date])
+            except Exception as e: logger.error(f"Error reading {file}: {e}")
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('video_json_migrated', ?)", (dt.datetime.now().isoformat(timespec='seconds'),))
+        if files: logger.info(f"Migrated {len(files)} video trend files from {json_dir} to {self.path}")
+        return len(files)
+
+    def migrate_csv(self, csv_dir):
+        """One-time import of the legacy yt_stats_<date>.csv files; later calls are no-ops."""
+        with self._connect() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'csv_migrated'").fetchone(): return 0
+        frames = []
+        for file in sorted(Path(csv_dir).glob("*.csv")):
+            try: frames.append(pd.read_csv(file))
+            except Exception as e: logger.error(f"Error reading {file}: {e}")
+        migrated = pd.concat(frames, ignore_index=True).drop_duplicates(subset=['channel_name', 'date'], keep='last') if frames else pd.DataFrame()
+        self.upsert(migrated)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_migrated', ?)", (dt.datetime.now().isoformat(timespec='seconds'),))
+        if len(migrated): logger.info(f"Migrated {len(migrated)} rows from {len(frames)} CSV files in {csv_dir} to {self.path}")
+        return len(migrated)
+
 class YouTubeChannelCompare:
-    """A class to track and compare YouTube channel views over time using daily CSV files."""
+    """A class to track and compare YouTube channel views over time using a SQLite daily history."""
     def __init__(self, 
                  config_file='yt_channel_config.yaml', 
                  data_dir='yt_stats_daily', 
                  output_dir='yt_visuals',
                  video_data_dir='yt_video_stats',
+                 history_db='yt_history.sqlite',
                  days=14,
                  top_n=10,
                  max_workers=10,
-                 timeout=15):
+                 timeout=15,
+                 requests_per_second=0.0):
         # Configuration and Directories
         self.config_file = config_file
         # Updated to create subdirectories within yt_cache and yt_output
@@ -34,10 +206,19 @@ class YouTubeChannelCompare:
         self.top_n = top_n
         self.max_workers = max_workers
         self.timeout = timeout
+        self.requests_per_second = requests_per_second
+        
+        # One pooled keep-alive session shared by all workers; requests are paced per host
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36', 'Accept-Language': 'en-US,en;q=0.9'})
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter); self.session.mount('http://', adapter)
+        self._host_slots, self._rate_lock = {}, threading.Lock()
         
         # Thresholds for Hot/Cold
         self.hot_threshold = 3.0
         self.cold_threshold = 0.2
+        self.breakout_threshold = 3.0 # Latest views/day vs the channel's median video views/day
         
         # Initialization
         self.channels = self.load_config()
@@ -49,6 +230,9 @@ class YouTubeChannelCompare:
         self.data_dir.mkdir(parents=True, exist_ok=True)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.video_data_dir.mkdir(parents=True, exist_ok=True)
+        self.store = ChannelHistoryStore(Path("yt_cache") / history_db)
+        self.store.migrate_csv(self.data_dir)
+        self.store.migrate_video_json(self.video_data_dir)
         self.data = self.load_all_data()
 
     def load_config(self):
@@ -58,71 +242,70 @@ class YouTubeChannelCompare:
             with open(self.config_file, 'r', encoding='utf-8') as file: return yaml.full_load(file) or {}
         except Exception as e: logger.error(f"Error loading config: {e}"); return {}
 
-    def load_all_data(self):
-        """Loads all daily CSV files and combines them into one DataFrame."""
-        all_dfs = []
-        for file in sorted(self.data_dir.glob("*.csv")):
-            try: all_dfs.append(pd.read_csv(file))
-            except Exception as e: logger.error(f"Error reading {file}: {e}")
-        if not all_dfs: return pd.DataFrame(columns=['channel_name', 'date', 'day_of_week', 'total_views_today'])
-        return pd.concat(all_dfs, ignore_index=True).drop_duplicates(subset=['channel_name', 'date'], keep='last')
+    def load_all_data(self, full=False):
+        """Loads the plotting window from the history store (a week of margin so the first day has a diff), or everything with full=True."""
+        since = None if full else (self.today - dt.timedelta(days=self.days + 7)).strftime("%Y-%m-%d")
+        return self.store.load(since)
+
+    def _get(self, url):
+        """GET through the pooled session, waiting for this host's next slot under requests_per_second."""
+        if self.requests_per_second:
+            host = urlparse(url).netloc
+            with self._rate_lock:
+                now = time.monotonic()
+                slot = max(now, self._host_slots.get(host, 0.0))
+                self._host_slots[host] = slot + 1.0 / self.requests_per_second
+            if slot > now: time.sleep(slot - now)
+        return self.session.get(url, timeout=self.timeout)
 
     def fetch_channel_data(self, url):
-        """Fetches channel data with robust multi-pattern regex for layout changes."""
-        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36', 'Accept-Language': 'en-US,en;q=0.9'}
+        """Fetches total views and recent videos from ytInitialData, with precompiled regex fallbacks for layout changes."""
         try:
             # 1. Fetch Total Views (Try About page first, fallback to main page)
             u_about = url.rstrip('/') + '/about'
-            response = requests.get(u_about, headers=headers, timeout=self.timeout)
+            response = self._get(u_about)
             
             if response.status_code == 404:
                 # Try main URL if /about 404s (sometimes happened with new handles)
-                response = requests.get(url, headers=headers, timeout=self.timeout)
+                response = self._get(url)
                 if response.status_code == 404:
                     return None, [], {"status": "DELETED", "msg": "404 - Channel confirmed deleted or URL changed."}
             
             response.raise_for_status()
             html = response.text
             
-            # Robust extraction logic: Try multiple common patterns
-            views = None
-            patterns = [
-                r'\"viewCountText\":\{\"simpleText\":\"(.*?)\"\}',
-                r'\"viewCountText\":\{.*?\"text\":\"(.*?)\".*?\}',
-                r'\"viewCount\":\"(\d+)\"',
-                r'viewCount\\\":\\\"(\d+)\\\"',
-                r'([0-9,]+) views'
-            ]
-            
-            for p in patterns:
-                match = re.search(p, html)
-                if match:
-                    try:
-                        val = match.group(1).replace(' views', '').replace(',', '').replace('\\"', '').replace('"', '')
-                        if val.isdigit():
-                            views = int(val)
-                            break
-                    except: continue
+            # Total views from ytInitialData, falling back to the precompiled patterns
+            data = _initial_data(html)
+            views = next((_parse_count(_text(r.get('viewCountText'))) for _, r in _find_renderers(data, ABOUT_RENDERERS)), None)
+            if views is None:
+                for p in VIEW_PATTERNS:
+                    match = p.search(html)
+                    val = match.group(1).replace(' views', '').replace(',', '').replace('\\"', '').replace('"', '') if match else ''
+                    if val.isdigit():
+                        views = int(val)
+                        logger.debug(f"{url}: views from fallback pattern {p.pattern!r}")
+                        break
 
             # 2. Fetch Recent Videos
             u_videos = url.rstrip('/') + '/videos'
-            response_videos = requests.get(u_videos, headers=headers, timeout=self.timeout)
-            
-            video_matches = re.findall(r'\"title\":\{\"runs\":\[\{\"text\":\"(.*?)\"\}\].*?\"viewCountText\":\{\"simpleText\":\"(.*?)\"\}', response_videos.text)
+            html_videos = self._get(u_videos).text
             
             hot_videos = []
-            for title, v_text in video_matches[:5]:
-                try:
-                    v_val = v_text.replace(' views', '').replace(',', '')
-                    if 'K' in v_val: count = float(v_val.replace('K', '')) * 1000
-                    elif 'M' in v_val: count = float(v_val.replace('M', '')) * 1000000
-                    else: count = float(v_val)
-                    hot_videos.append({'title': title, 'views': int(count)})
-                except: continue
+            for _, r in _find_renderers(_initial_data(html_videos), VIDEO_RENDERERS):
+                count = _parse_count(_text(r.get('viewCountText')))
+                if count is not None:
+                    hot_videos.append({'video_id': r.get('videoId'), 'title': _text(r.get('title')), 'views': count})
+                if len(hot_videos) == 5: break
+            if not hot_videos:
+                for title, v_text in VIDEO_PATTERN.findall(html_videos)[:5]:
+                    count = _parse_count(v_text)
+                    if count is not None: hot_videos.append({'title': title, 'views': count})
 
             error_info = None
             if views is None:
-                error_info = {"status": "LAYOUT", "msg": "Page loaded but all 5 regex patterns failed. YouTube layout changed significantly."}
+                if data is None: msg = "Page loaded but has no parseable ytInitialData, and the fallback patterns failed. YouTube layout changed significantly."
+                else: msg = f"ytInitialData parsed but no view count under {'/'.join(ABOUT_RENDERERS)}, and the fallback patterns failed."
+                error_info = {"status": "LAYOUT", "msg": msg}
 
             return views, hot_videos, error_info
             
@@ -158,13 +341,9 @@ class YouTubeChannelCompare:
                 except Exception as e: 
                     logger.error(f"Error processing {handle}: {e}")
 
-        # Save Channel Stats
+        # Save Channel Stats (re-running today replaces today's row per channel)
         if new_rows:
-            today_csv = self.data_dir / f"yt_stats_{self.date_str}.csv"
-            new_df = pd.DataFrame(new_rows)
-            if today_csv.exists(): 
-                new_df = pd.concat([pd.read_csv(today_csv), new_df], ignore_index=True)
-            new_df.drop_duplicates(subset=['channel_name'], keep='last').to_csv(today_csv, index=False, encoding='utf-8')
+            self.store.upsert(pd.DataFrame(new_rows).drop_duplicates(subset=['channel_name'], keep='last'))
 
         # Print Warnings Report
         if warnings:
@@ -179,44 +358,99 @@ class YouTubeChannelCompare:
                 print("-" * 50)
 
         if video_logs:
-            log_file = self.video_data_dir / f"video_trends_{self.date_str}.json"
-            with open(log_file, 'w', encoding='utf-8') as f:
-                json.dump(video_logs, f, indent=4)
+            self.store.upsert_videos(self.date_str, video_logs)
 
         self.data = self.load_all_data()
 
+    def compute_momentum(self):
+        """
+        Pivots the history into a daily date x channel matrix (days without a run are empty rows) and
+        computes, for the plot window, each channel's gain, momentum (gain / its average gain over the
+        last 7 calendar days) and total growth, plus the Hot/Cold/Steady status of its latest
+        momentum. Returns (long plot frame, growth totals, status).
+        """
+        views = self.data.pivot_table(index='date', columns='channel_name', values='total_views_today', aggfunc='last')
+        views.index = pd.to_datetime(views.index)
+        views = views.reindex(pd.date_range(views.index.min(), views.index.max(), freq='D'))
+        v = views.to_numpy(dtype=float)
+        valid = ~np.isnan(v)
+
+        # Gain vs. each channel's previous observation; the first observation counts as 0
+        prev = pd.DataFrame(v).ffill().shift(1).to_numpy()
+        gain = np.where(valid, np.nan_to_num(v - prev, nan=0.0), np.nan)
+
+        in_window = views.index >= (pd.Timestamp(self.today) - dt.timedelta(days=self.days))
+        gain, valid, dates = gain[in_window], valid[in_window], views.index[in_window]
+        keep = valid.any(axis=0)
+        gain, valid, channels = gain[:, keep], valid[:, keep], views.columns[keep]
+        if not len(channels): return pd.DataFrame(), pd.Series(dtype=float), pd.Series(dtype=object)
+
+        # Momentum (Current Gain vs 7-day Avg): 7-row windows are 7 calendar days; only observed days count
+        sums = np.cumsum(np.where(valid, gain, 0.0), axis=0)
+        counts = np.cumsum(valid, axis=0)
+        sums[7:] -= sums[:-7].copy(); counts[7:] -= counts[:-7].copy()
+        avg_gain = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        momentum = np.round(gain / np.where(avg_gain == 0, 1, avg_gain), 2)
+
+        # Latest momentum per channel, classified against the thresholds in one shot
+        last_row = len(dates) - 1 - np.argmax(valid[::-1], axis=0)
+        last_momentum = momentum[last_row, np.arange(len(channels))]
+        status = pd.Series(np.select([last_momentum >= self.hot_threshold, last_momentum <= self.cold_threshold],
+                                     ["🔥 HOT", "❄️ COLD"], "Steady"), index=channels)
+        growth_totals = pd.Series(np.nansum(gain, axis=0), index=channels).sort_values(ascending=False, kind='stable')
+
+        rows, cols = np.nonzero(valid)
+        plot_df = pd.DataFrame({'date': dates[rows], 'channel_name': channels[cols],
+                                'diff': gain[rows, cols], 'momentum': momentum[rows, cols]})
+        return plot_df, growth_totals, status
+
+    def video_velocity(self):
+        """
+        Per-video views/day over the plot window (first to last snapshot) and over its latest two
+        snapshots, from a date x video matrix. A video is a breakout when its latest views/day is at
+        least breakout_threshold times the median window views/day of its channel's tracked videos.
+        """
+        since = (self.today - dt.timedelta(days=self.days)).strftime("%Y-%m-%d")
+        snaps = self.store.load_video_views(since)
+        if snaps.empty: return pd.DataFrame()
+        views = snaps.pivot_table(index='date', columns='video_id', values='views', aggfunc='last')
+        v = views.to_numpy(dtype=float)
+        days = pd.to_datetime(views.index).to_numpy().astype('datetime64[D]').astype(float)[:, None]
+        valid = ~np.isnan(v)
+        n, cols = len(v), np.arange(v.shape[1])
+
+        first_row, last_row = np.argmax(valid, axis=0), n - 1 - np.argmax(valid[::-1], axis=0)
+        # Row of the previous snapshot: last valid row strictly before last_row (falls back to first_row)
+        rows = np.where(valid, np.arange(n)[:, None], -1)
+        rows[last_row, cols] = -1
+        prev_row = np.maximum(rows.max(axis=0), first_row)
+
+        def per_day(a, b):
+            span = days[b, 0] - days[a, 0]
+            return np.divide(v[b, cols] - v[a, cols], span, out=np.zeros(len(cols)), where=span > 0)
+
+        meta = snaps.drop_duplicates('video_id').set_index('video_id').loc[views.columns, ['channel_name', 'title', 'first_seen']]
+        out = meta.assign(views=v[last_row, cols].astype(int), velocity=per_day(first_row, last_row).round(1),
+                          latest_velocity=per_day(prev_row, last_row).round(1))
+        channel_median = out.groupby('channel_name')['velocity'].transform('median')
+        out['breakout'] = (out['latest_velocity'] > 0) & (out['latest_velocity'] >= self.breakout_threshold * channel_median)
+        return out.reset_index().sort_values('latest_velocity', ascending=False, ignore_index=True)
+
     def generate_plot(self):
         """Generates Plotly graphs with Hot/Cold trend detection."""
         if self.data.empty: return
-        df = self.data.copy()
-        df['date'] = pd.to_datetime(df['date'])
-        df = df.sort_values(by=['channel_name', 'date'])
-        df['diff'] = df.groupby('channel_name')['total_views_today'].diff().fillna(0)
-        
-        plot_df = df[df['date'] >= (pd.Timestamp(self.today) - dt.timedelta(days=self.days))]
+        plot_df, growth_totals, status = self.compute_momentum()
         if plot_df.empty: return
-
-        # Calculate Momentum (Current Gain vs 7-day Avg)
-        avg_gain = plot_df.groupby('channel_name')['diff'].transform(lambda x: x.rolling(window=7, min_periods=1).mean())
-        plot_df['momentum'] = (plot_df['diff'] / avg_gain.replace(0, 1)).round(2)
         
         # Rank by total growth
-        growth_totals = plot_df.groupby('channel_name')['diff'].sum().sort_values(ascending=False)
         top_list = growth_totals.head(self.top_n).index.tolist()
         bottom_list = growth_totals.tail(self.top_n).index.tolist()
         
         plot_channels = top_list + bottom_list
-        plot_df = plot_df[plot_df['channel_name'].isin(plot_channels)]
+        plot_df = plot_df[plot_df['channel_name'].isin(plot_channels)].sort_values(['channel_name', 'date'])
         
         # Determine status indicators
-        status_map = {}
-        for chan in plot_channels:
-            chan_data = plot_df[plot_df['channel_name'] == chan]
-            if not chan_data.empty:
-                last_momentum = chan_data.iloc[-1]['momentum']
-                if last_momentum >= self.hot_threshold: status_map[chan] = "🔥 HOT"
-                elif last_momentum <= self.cold_threshold: status_map[chan] = "❄️ COLD"
-                else: status_map[chan] = "Steady"
+        status_map = status[plot_channels].to_dict()
 
         fig = px.line(plot_df, 
                       x='date', 
@@ -262,6 +496,13 @@ class YouTubeChannelCompare:
         for c in [k for k,v in status_map.items() if "COLD" in v]:
             print(f"📉 {c}: {status_map[c]} (Momentum dropped significantly)")
 
+        velocity = self.video_velocity()
+        if not velocity.empty:
+            velocity.to_csv(self.video_data_dir / f"video_velocity_{self.date_str}.csv", index=False, encoding='utf-8')
+            print(f"\n[💥 BREAKOUT VIDEOS]")
+            for r in velocity[velocity['breakout']].itertuples():
+                print(f"🎬 {r.channel_name}: {r.title} (+{r.latest_velocity:,.0f} views/day vs {r.velocity:,.0f} avg)")
+
     def run(self, plot=False): 
         if plot: self.generate_plot()
         else: self.update_data()
@@ -275,7 +516,9 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("-d", "--days", type=int, default=14)
     parser.add_argument("-n", "--top_n", type=int, default=10)
+    parser.add_argument("-w", "--workers", type=int, default=10, help="Concurrent channel fetches")
+    parser.add_argument("--rate", type=float, default=0.0, help="Cap on requests per second to youtube.com (default 0 = unpaced, bounded only by --workers)")
     parser.add_argument("--plot", action="store_true", help="Generate interactive growth plot")
     args = parser.parse_args()
     
-    YouTubeChannelCompare(days=args.days, top_n=args.top_n).run(plot=args.plot)
\ No newline at end of file
+    YouTubeChannelCompare(days=args.days, top_n=args.top_n, max_workers=args.workers, requests_per_second=args.rate).run(plot=args.plot)
\ No newline at end of file